@@ -0,0 +1 @@
+"""Benchmarks of the framework, run as `python -m benchmarks.<name>`."""
@@ -0,0 +1,91 @@
+"""Decoding and model building time and memory of a large folder listing.
+
+Usage: python -m benchmarks.decoding [--items N] [--repeat N]
+"""
+
+import argparse
+import gc
+import json
+import time
+import tracemalloc
+from typing import Any, Callable
+
+import requests
+
+from framework.apis import decoding
+from framework.apis.decoding import response_json
+from framework.apis.yandex_disk import CompactFolder, Folder
+from framework.stubs import resource_payload
+
+
+def _response(items: int) -> requests.Response:
+    """A received `/resources` response of a folder with `items` files."""
+    folder = resource_payload("/test_folder", "dir") | {"_embedded": {
+        "sort": "",
+        "path": "disk:/test_folder",
+        "items": [resource_payload(f"/test_folder/pug_{i}.jpg", "file") for i in range(items)],
+        "limit": items,
+        "offset": 0,
+        "total": items,
+    }}
+    res = requests.Response()
+    res.status_code = 200
+    res.headers["Content-Type"] = "application/json"
+    res._content = json.dumps(folder).encode()
+    return res
+
+
+def _stdlib_json(res: requests.Response) -> Any:
+    orjson, decoding.orjson = decoding.orjson, None
+    try:
+        return response_json(res)
+    finally:
+        decoding.orjson = orjson
+
+
+def _measure(func: Callable[[], Any], repeat: int) -> tuple[float, float]:
+    """Best of `repeat` runs of `func` in milliseconds and its peak allocation in MiB."""
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    gc.collect()
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return min(timings) * 1000, peak / 2 ** 20
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    res = _response(args.items)
+    parsed = response_json(res)
+    cases = [
+        ("Response.json", lambda: res.json()),
+        ("response_json, stdlib", lambda: _stdlib_json(res)),
+    ]
+    if decoding.orjson is not None:
+        cases.append(("response_json, orjson", lambda: response_json(res)))
+    cases += [
+        ("Folder", lambda: Folder.build_from_response(parsed)),
+        ("CompactFolder", lambda: CompactFolder.build_from_response(parsed)),
+        ("Response.json + Folder", lambda: Folder.build_from_response(res.json())),
+        ("response_json + CompactFolder", lambda: CompactFolder.build_from_response(response_json(res))),
+    ]
+
+    print(f"{len(res.content) / 2 ** 20:.1f} MiB body, {args.items} items")
+    print(f"{'case':<32}{'ms':>10}{'peak MiB':>10}")
+    for name, func in cases:
+        elapsed, peak = _measure(func, args.repeat)
+        print(f"{name:<32}{elapsed:>10.1f}{peak:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
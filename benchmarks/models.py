@@ -0,0 +1,49 @@
+"""Per-item construction time and memory of Yandex Disk folder item models.
+
+Usage: python -m benchmarks.models [--items N]
+"""
+
+import argparse
+import gc
+import time
+import tracemalloc
+from typing import Callable
+
+from framework.apis.yandex_disk import CompactFolderItem, FolderItem
+from framework.stubs import resource_payload
+
+
+def _measure(build: Callable[[dict], object], payloads: list[dict]) -> tuple[float, float]:
+    """Build an item per payload, return microseconds and bytes per item."""
+    gc.collect()
+    started = time.perf_counter()
+    items = [build(payload) for payload in payloads]
+    elapsed = time.perf_counter() - started
+    del items
+
+    gc.collect()
+    tracemalloc.start()
+    items = [build(payload) for payload in payloads]
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del items
+    return elapsed / len(payloads) * 1e6, allocated / len(payloads)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=100_000)
+    args = parser.parse_args()
+
+    payloads = [resource_payload(f"/test_folder/pug_{i}.jpg", "file") for i in range(args.items)]
+    print(f"{'model':<20}{'us/item':>10}{'bytes/item':>12}")
+    for name, build in (
+            ("FolderItem", FolderItem.build_from_response),
+            ("CompactFolderItem", CompactFolderItem.build_from_response),
+    ):
+        per_item, size = _measure(build, payloads)
+        print(f"{name:<20}{per_item:>10.2f}{size:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
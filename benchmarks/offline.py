@@ -0,0 +1,212 @@
+"""End-to-end scenarios of `DogCeoApi` and `YaUploader` against local stubs.
+
+Reports throughput, p50/p99 request latency and peak memory per scenario and saves the results
+as JSON, so that runs can be compared.
+
+Usage: python -m benchmarks.offline [--scenario NAME] [--latency S] [--error-rate R] [--throttle-rate R]
+                                    [--operation-duration S] [--output PATH] [--baseline PATH]
+"""
+from __future__ import annotations
+
+import argparse
+import datetime
+import gc
+import json
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from typing import Callable
+
+from framework.apis.dog_ceo import DogCeoApi, file_name_from_url
+from framework.apis.metrics import Histogram, Metrics
+from framework.apis.operations import PollBackoff
+from framework.apis.policy import RetryPolicy
+from framework.apis.yandex_disk import YaUploader
+from framework.pipeline import run_transfer
+from framework.stubs import DogCeoStub, YandexDiskStub, resource_payload
+
+_FOLDER = "benchmark"
+
+
+@dataclass(frozen=True)
+class StubConfig:
+    """Behaviour of both stubs."""
+    latency: float = 0.0
+    error_rate: float = 0.0
+    throttle_rate: float = 0.0
+    operation_duration: float = 0.0
+
+
+@dataclass
+class ScenarioResult:
+    """Outcome of a scenario run."""
+    items: int
+    elapsed: float
+    requests: int
+    p50: float
+    p99: float
+    peak_memory: int = 0
+
+    @property
+    def throughput(self) -> float:
+        """Items per second."""
+        return self.items / self.elapsed if self.elapsed else 0.0
+
+
+class _Environment:
+    """Stubs and API handlers of a single scenario run, sharing one `Metrics`."""
+
+    def __init__(self, config: StubConfig, breeds: dict[str, list[str]]):
+        faults = {"latency": config.latency, "error_rate": config.error_rate, "throttle_rate": config.throttle_rate}
+        self.dog_stub = DogCeoStub(breeds, **faults).start()
+        self.disk_stub = YandexDiskStub(operation_duration=config.operation_duration, **faults).start()
+        self.metrics = Metrics()
+        retry_policy = RetryPolicy(max_attempts=10, base_delay=0.05, max_delay=1.0)
+        self.dog_api = DogCeoApi(
+            base_url=self.dog_stub.api_url,
+            retry_policy=retry_policy,
+            bulk=True,
+            metrics=self.metrics,
+        )
+        self.disk_api = YaUploader(
+            token="benchmark",
+            base_url=self.disk_stub.api_url,
+            poll_backoff=PollBackoff(initial=0.01, max_delay=0.25),
+            retry_policy=retry_policy,
+            metrics=self.metrics,
+        )
+
+    def close(self) -> None:
+        self.dog_api.close()
+        self.disk_api.close()
+        self.dog_stub.stop()
+        self.disk_stub.stop()
+
+    def latency(self) -> Histogram:
+        """Latency of all requests merged into one histogram."""
+        merged = Histogram()
+        for histogram in self.metrics.latency.values():
+            merged.counts = [a + b for a, b in zip(merged.counts, histogram.counts)]
+            merged.sum += histogram.sum
+            merged.count += histogram.count
+        return merged
+
+
+def _one_breed(env: _Environment, size: int) -> int:
+    """Resolve and upload an image per sub breed of a single breed with `size` sub breeds."""
+    urls = env.dog_api.get_urls("breed0", env.dog_api.get_sub_breeds("breed0"))
+    env.disk_api.create_folder(_FOLDER)
+    env.disk_api.upload_many(_FOLDER, ((url, file_name_from_url(url)) for url in urls))
+    return len(urls)
+
+
+def _all_breeds(env: _Environment, size: int) -> int:
+    """Resolve and upload an image per sub breed of every breed through the pipeline."""
+    report = run_transfer(env.dog_api, env.disk_api, env.dog_api.catalog, _FOLDER)
+    if report.failures:
+        raise report.failures[0].error
+    return report.stages[-1].processed
+
+
+def _listing(env: _Environment, size: int) -> int:
+    """List a folder of `size` files page by page."""
+    env.disk_stub.resources[f"/{_FOLDER}"] = resource_payload(f"/{_FOLDER}", "dir")
+    for i in range(size):
+        path = f"/{_FOLDER}/pug_{i}.jpg"
+        env.disk_stub.resources[path] = resource_payload(path, "file")
+    return sum(1 for _ in env.disk_api.iter_folder(_FOLDER, fields=("name", "type", "md5")))
+
+
+# Name -> (run, default size).
+SCENARIOS: dict[str, tuple[Callable[[_Environment, int], int], int]] = {
+    "one_breed": (_one_breed, 8),
+    "all_breeds": (_all_breeds, 100),
+    "listing": (_listing, 10_000),
+}
+
+
+def _catalog(name: str, size: int) -> dict[str, list[str]]:
+    """Breeds served to scenario `name`: `size` breeds, every other one with 1-4 sub breeds, for `all_breeds`."""
+    if name == "one_breed":
+        return {"breed0": [f"sub{j}" for j in range(size)]}
+    if name == "all_breeds":
+        return {f"breed{i}": [f"sub{j}" for j in range(i % 5)] if i % 2 else [] for i in range(size)}
+    return {}
+
+
+def run_scenario(name: str, config: StubConfig, size: int = None) -> ScenarioResult:
+    """Run scenario `name` twice: timed, then under tracemalloc for the peak memory."""
+    run, default_size = SCENARIOS[name]
+    size = size or default_size
+    breeds = _catalog(name, size)
+
+    env = _Environment(config, breeds)
+    try:
+        gc.collect()
+        started = time.perf_counter()
+        items = run(env, size)
+        elapsed = time.perf_counter() - started
+        latency = env.latency()
+        requests = env.dog_stub.requests + env.disk_stub.requests
+    finally:
+        env.close()
+
+    # NOTE: стабы крутятся в том же процессе и тоже попадают в пик, но их доля одинакова между прогонами.
+    env = _Environment(config, breeds)
+    try:
+        gc.collect()
+        tracemalloc.start()
+        run(env, size)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    finally:
+        env.close()
+    return ScenarioResult(items, elapsed, requests, latency.quantile(0.5), latency.quantile(0.99), peak)
+
+
+def _compare(result: ScenarioResult, baseline: dict | None) -> str:
+    if baseline is None:
+        return ""
+    return f"{result.throughput / baseline['throughput']:>9.2f}x" if baseline["throughput"] else ""
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenario", choices=SCENARIOS, action="append", help="all scenarios by default")
+    parser.add_argument("--size", type=int, help="breeds or folder items, per scenario default if omitted")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds per stub request")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of 500 responses")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="fraction of 429 responses")
+    parser.add_argument("--operation-duration", type=float, default=0.0, help="seconds per async operation")
+    parser.add_argument("--output", default="bench_results.json", help="where to save the results")
+    parser.add_argument("--baseline", help="results of a previous run to compare throughput with")
+    args = parser.parse_args()
+
+    config = StubConfig(args.latency, args.error_rate, args.throttle_rate, args.operation_duration)
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["scenarios"]
+
+    results = {}
+    header = f"{'scenario':<12}{'items':>8}{'requests':>10}{'items/s':>10}{'p50 ms':>9}{'p99 ms':>9}{'peak MiB':>10}"
+    print(header + (f"{'vs base':>10}" if baseline else ""))
+    for name in args.scenario or SCENARIOS:
+        result = run_scenario(name, config, args.size)
+        results[name] = asdict(result) | {"throughput": result.throughput}
+        print(
+            f"{name:<12}{result.items:>8}{result.requests:>10}{result.throughput:>10.1f}"
+            f"{result.p50 * 1000:>9.1f}{result.p99 * 1000:>9.1f}{result.peak_memory / 2 ** 20:>10.1f}"
+            f"{_compare(result, baseline.get(name))}"
+        )
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+            "config": asdict(config),
+            "scenarios": results,
+        }, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""Requests per second with and without connection pooling.
+
+Usage: python -m benchmarks.pooling [--requests N] [--threads N]
+"""
+
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+import requests
+
+from framework.apis.dog_ceo import DogCeoApi
+from framework.apis.session import SessionConfig
+from framework.stubs import DogCeoStub
+
+
+def _measure(api: DogCeoApi, method: Callable[..., requests.Response], total: int, threads: int) -> float:
+    """Send `total` requests over `threads` threads, return requests per second."""
+    def send(_) -> None:
+        api._send_request(method, "/breed/spaniel/list")
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(send, range(total)))
+    return total / (time.perf_counter() - started)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+
+    with DogCeoStub() as stub:
+        api = DogCeoApi(SessionConfig(pool_maxsize=args.threads), base_url=stub.api_url)
+        # NOTE: `requests.get` -- новая сессия и новое соединение на каждый запрос, как было до пулинга.
+        unpooled = _measure(api, requests.get, args.requests, args.threads)
+        pooled = _measure(api, api.session.get, args.requests, args.threads)
+        api.close()
+
+    print(f"unpooled: {unpooled:10.1f} req/s")
+    print(f"pooled:   {pooled:10.1f} req/s")
+    print(f"speedup:  {pooled / unpooled:10.2f}x")
+
+
+if __name__ == "__main__":
+    main()
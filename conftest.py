@@ -0,0 +1,37 @@
+"""Fixtures shared by the offline tests: stub servers and API handlers bound to them."""
+from __future__ import annotations
+
+import pytest
+
+from framework.apis.dog_ceo import DogCeoApi
+from framework.apis.yandex_disk import YaUploader
+from framework.stubs import DogCeoStub, YandexDiskStub
+
+
+@pytest.fixture
+def dog_stub():
+    """Provide a running Dog CEO stub."""
+    with DogCeoStub() as stub:
+        yield stub
+
+
+@pytest.fixture
+def dog_api(dog_stub):
+    """Provide Dog Ceo API handler bound to the stub."""
+    api = DogCeoApi(base_url=dog_stub.api_url)
+    yield api
+    api.close()
+
+
+@pytest.fixture
+def disk_stub():
+    """Provide a running Yandex Disk stub."""
+    with YandexDiskStub() as stub:
+        yield stub
+
+
+@pytest.fixture
+def yandex_disk_api(disk_stub):
+    """Provide Yandex Disk API handler bound to the stub."""
+    with YaUploader(token="test", base_url=disk_stub.api_url) as disk_api:
+        yield disk_api
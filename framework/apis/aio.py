@@ -0,0 +1,157 @@
+"""Asyncio counterparts of the API handlers.
+
+Requests are still sent by the pooled sync handlers, but in a thread pool bounded by a semaphore,
+so independent calls (sub-breeds, uploads, breeds) run concurrently.
+"""
+from __future__ import annotations
+
+import abc
+import asyncio
+import functools
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, TypeVar
+
+import requests
+
+from framework.apis.base import BaseApi
+from framework.apis.dog_ceo import DogCeoApi, file_name_from_url
+from framework.apis.session import SessionConfig
+from framework.apis.yandex_disk import Folder, UploadMode, YaUploader
+
+_T = TypeVar("_T")
+
+
+class AsyncBaseApi(abc.ABC):
+    """The most basic asyncio API, wrapping a sync `api`."""
+
+    def __init__(self, api: BaseApi, max_concurrency: int = 10):
+        self.api = api
+        self.max_concurrency = max_concurrency
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_concurrency,
+            thread_name_prefix=type(self).__name__,
+        )
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self) -> None:
+        """Release worker threads and pooled connections."""
+        self._executor.shutdown(wait=False)
+        self.api.close()
+
+    async def _run(self, func: Callable[..., _T], *args) -> _T:
+        """Run blocking `func` in the worker pool, at most `max_concurrency` at once."""
+        async with self._semaphore:
+            return await asyncio.get_running_loop().run_in_executor(
+                self._executor,
+                functools.partial(func, *args),
+            )
+
+    async def _send_request(
+            self,
+            method: Callable[..., requests.Response],
+            endpoint: str,
+            headers: dict[str, str] = None,
+            params: dict[str, str] = None,
+    ) -> requests.Response:
+        """Request sender.
+
+        Raises:
+            HTTPError: if any unexpected status occurs.
+        """
+        return await self._run(self.api._send_request, method, endpoint, headers, params)
+
+
+class AsyncDogCeoApi(AsyncBaseApi):
+    """Asyncio Dog.Ceo API handler."""
+    api: DogCeoApi
+
+    def __init__(self, api: DogCeoApi = None, max_concurrency: int = 10):
+        super().__init__(api or DogCeoApi(SessionConfig(pool_maxsize=max_concurrency)), max_concurrency)
+
+    async def get_sub_breeds(self, breed: str) -> tuple[str, ...]:
+        """Get sub breeds of `breed`."""
+        return await self._run(self.api.get_sub_breeds, breed)
+
+    async def get_urls(self, breed: str, sub_breeds: Iterable[str]) -> tuple[str, ...]:
+        """Get image urls for `sub_breeds` if any or `breed` itself, all sub breeds at once."""
+        if sub_breeds:
+            return tuple(await asyncio.gather(*(
+                self._run(self.api.get_url, breed, sub_breed) for sub_breed in sub_breeds
+            )))
+        return (await self._run(self.api.get_url, breed),)
+
+
+class AsyncYaUploader(AsyncBaseApi):
+    """Asyncio Ya Disk API provider."""
+    api: YaUploader
+
+    def __init__(self, token: str = None, api: YaUploader = None, max_concurrency: int = 10):
+        if api is None:
+            api = YaUploader(token, SessionConfig(pool_maxsize=max_concurrency))
+        super().__init__(api, max_concurrency)
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        try:
+            await self.clean_up()
+        finally:
+            self.close()
+
+    async def create_folder(self, path: str) -> None:
+        """Creates a `path` folder."""
+        await self._run(self.api.create_folder, path)
+
+    async def upload_photos_to_yd(self, path: str, url_file: str, name: str, mode: UploadMode = None) -> None:
+        """Upload photo to the `path` with name `name` from `url_file`.
+
+        Started like `YaUploader.upload_photos_to_yd` without waiting, so its `mode` and `upload_concurrency` apply,
+        then awaited without blocking the loop. Failed operations are resubmitted according to `retry_policy`.
+        """
+        for attempt in itertools.count(1):
+            future = await self._run(self.api.upload_photos_to_yd, path, url_file, name, False, mode)
+            try:
+                return await asyncio.wrap_future(future)
+            except Exception as e:
+                await asyncio.sleep(self.api.operation_retry_delay(attempt, [e]))
+
+    async def upload_photos(self, path: str, urls: Iterable[str]) -> tuple[str, ...]:
+        """Upload all `urls` to `path` concurrently, return the file names."""
+        urls = tuple(urls)
+        names = tuple(file_name_from_url(url) for url in urls)
+        await asyncio.gather(*(
+            self.upload_photos_to_yd(path, url, name) for url, name in zip(urls, names)
+        ))
+        return names
+
+    async def get_folder(self, folder_path: str) -> Folder:
+        """Get `folder_path` from the disk."""
+        return await self._run(self.api.get_folder, folder_path)
+
+    async def clean_up(self) -> None:
+        """Clean up all folders created by this instance."""
+        await self._run(self.api.clean_up)
+
+
+async def transfer_breeds(
+        dog_api: AsyncDogCeoApi,
+        disk_api: AsyncYaUploader,
+        breeds: Iterable[str],
+        path: str,
+) -> dict[str, tuple[str, ...]]:
+    """Upload an image per sub breed of every breed to `path`, all breeds at once.
+
+    Returns uploaded file names per breed.
+    """
+    async def transfer(breed: str) -> tuple[str, ...]:
+        urls = await dog_api.get_urls(breed, await dog_api.get_sub_breeds(breed))
+        return await disk_api.upload_photos(path, urls)
+
+    breeds = tuple(breeds)
+    await disk_api.create_folder(path)
+    return dict(zip(breeds, await asyncio.gather(*(transfer(breed) for breed in breeds))))
@@ -1,16 +1,65 @@
 """The basic abstract APIs."""
 
 import abc
-from typing import Callable
+import contextlib
+import functools
+import time
+from typing import Callable, ContextManager
+from urllib.parse import urlsplit
 
 import requests
 
+from framework.apis.concurrency import AIMDLimiter
+from framework.apis.metrics import Metrics
+from framework.apis.policy import RateLimiter, RetryPolicy, RetryStats, RetryReason
+from framework.apis.session import SessionConfig, build_session
+
 
 class BaseApi(abc.ABC):
-    """The most basic abstract API."""
+    """The most basic abstract API.
+
+    Every request is recorded to `metrics`, which may be shared between handlers.
+    Requests in flight are limited by `concurrency` if given.
+    """
     BASE_URL: str
 
-    @abc.abstractmethod
+    def __init__(
+            self,
+            session_config: SessionConfig = None,
+            base_url: str = None,
+            retry_policy: RetryPolicy = None,
+            rate_limiter: RateLimiter = None,
+            metrics: Metrics = None,
+            concurrency: AIMDLimiter = None,
+    ):
+        self.session_config = session_config or SessionConfig()
+        # NOTE: одна сессия на инстанс -- соединения переиспользуются между вызовами и потоками.
+        self.session = build_session(self.session_config)
+        if base_url is not None:
+            self.BASE_URL = base_url
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.stats = RetryStats()
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.concurrency = concurrency
+        if concurrency is not None:
+            concurrency.attach_metrics(self.metrics)
+
+    def close(self) -> None:
+        """Close all pooled connections."""
+        self.session.close()
+
+    def _prepare_headers(self, headers: dict[str, str]) -> dict[str, str]:
+        """Headers actually sent along with `headers` of a request."""
+        return headers
+
+    def _endpoint_label(self, url: str) -> str:
+        """Low cardinality metrics label of `url`: its path relative to `BASE_URL` by default.
+
+        Handlers with path parameters in endpoints override it to collapse them into placeholders.
+        """
+        return url.removeprefix(self.BASE_URL) if url.startswith(self.BASE_URL) else urlsplit(url).path
+
     def _send_request(
             self,
             method: Callable[..., requests.Response],
@@ -18,9 +67,100 @@ class BaseApi(abc.ABC):
             headers: dict[str, str] = None,
             params: dict[str, str] = None,
     ) -> requests.Response:
-        """Request sender.
+        """Request sender, retrying throttled and failed requests according to `retry_policy`.
+
+        `method` is expected to be a bound method of `self.session`, e.g. `self.session.get`.
 
         Raises:
             HTTPError: if any unexpected status occurs.
         """
-        ...
+        if not endpoint.startswith('/'):
+            endpoint = f'/{endpoint}'
+        return self._send_url(method, f"{self.BASE_URL}{endpoint}", self._prepare_headers(headers or {}), params)
+
+    def _send_url(
+            self,
+            method: Callable[..., requests.Response],
+            url: str,
+            headers: dict[str, str] = None,
+            params: dict[str, str] = None,
+            **kwargs,
+    ) -> requests.Response:
+        """Send a request to the full `url` as is, retried, rate limited and recorded like every request.
+
+        Unlike `_send_request` it adds no headers, so it suits urls of other hosts.
+        Extra `kwargs` go to `method`.
+
+        Raises:
+            HTTPError: if any unexpected status occurs.
+        """
+        return self.retry_policy.run(
+            functools.partial(self._send_request_once, **kwargs),
+            method,
+            url,
+            headers or {},
+            params or {},
+            stats=self.stats,
+            on_retry=lambda error, delay: self._on_retry(url, error, delay),
+        )
+
+    def _send_request_once(
+            self,
+            method: Callable[..., requests.Response],
+            url: str,
+            headers: dict[str, str],
+            params: dict[str, str],
+            **kwargs,
+    ) -> requests.Response:
+        throttled = self.rate_limiter.acquire(url)
+        self.stats.record_throttling(throttled)
+        self.metrics.observe_throttling(type(self).__name__, throttled)
+        with self._slot(self.concurrency):
+            started = time.perf_counter()
+            res = None
+            try:
+                res = method(url, headers=headers, params=params, timeout=self.session_config.timeout, **kwargs)
+            finally:
+                self._observe_response(method.__name__.upper(), url, res, time.perf_counter() - started)
+            try:
+                res.raise_for_status()
+            except requests.HTTPError:
+                # A body streamed with `stream=True` is never read, its pooled connection must not wait for GC.
+                res.close()
+                raise
+        return res
+
+    @staticmethod
+    def _slot(limiter: AIMDLimiter | None) -> ContextManager:
+        """A slot of `limiter`, nothing to wait for without it."""
+        return limiter.slot() if limiter is not None else contextlib.nullcontext()
+
+    def _observe_response(self, method: str, url: str, res: requests.Response | None, elapsed: float) -> None:
+        """Record a request to `metrics`, `res` is `None` if it failed without a response."""
+        body = res.request.body if res is not None else None
+        self.metrics.observe_request(
+            type(self).__name__,
+            method,
+            self._endpoint_label(url),
+            res.status_code if res is not None else None,
+            elapsed,
+            bytes_sent=len(body) if isinstance(body, (bytes, str)) else 0,
+            # NOTE: при stream=True тело ещё не прочитано, его размер берём из заголовка.
+            bytes_received=int(res.headers.get("Content-Length", 0)) if res is not None else 0,
+        )
+
+    def _record_retry(self, endpoint: str, error: Exception, delay: float) -> None:
+        """Record a retry of `endpoint` label to `metrics`."""
+        reason = RetryPolicy.classify(error)
+        self.metrics.observe_retry(
+            type(self).__name__,
+            endpoint,
+            reason.name if reason is not None else type(error).__name__,
+            delay,
+        )
+
+    def _on_retry(self, url: str, error: Exception, delay: float) -> None:
+        self._record_retry(self._endpoint_label(url), error, delay)
+        if RetryPolicy.classify(error) is RetryReason.THROTTLED:
+            # Other threads must not keep hammering the host while it asks us to back off.
+            self.rate_limiter.pause(url, delay)
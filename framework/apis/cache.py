@@ -0,0 +1,179 @@
+"""Response caches with TTLs and size-bounded LRU eviction."""
+from __future__ import annotations
+
+import abc
+import collections
+import json
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any
+
+
+@dataclass
+class CacheStats:
+    """Thread safe cache counters."""
+    hits: int = 0
+    misses: int = 0
+    # Entries dropped to stay within the size caps.
+    evictions: int = 0
+    # Entries dropped because their TTL ran out.
+    expirations: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def record(self, **counters: int) -> None:
+        with self._lock:
+            for name, value in counters.items():
+                setattr(self, name, getattr(self, name) + value)
+
+
+class CacheBackend(abc.ABC):
+    """Key-value cache of JSON serializable values.
+
+    Least recently used entries are evicted once there are more than `max_entries` of them
+    or their encoded values take more than `max_bytes`, `None` means no limit.
+    """
+
+    def __init__(self, max_entries: int = None, max_bytes: int = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.stats = CacheStats()
+
+    def get(self, key: str) -> Any | None:
+        """Cached value of `key`, `None` on a miss."""
+        value = self.peek(key)
+        self.stats.record(**{"hits" if value is not None else "misses": 1})
+        return value
+
+    @abc.abstractmethod
+    def peek(self, key: str) -> Any | None:
+        """Like `get`, but not counted as a hit or a miss, e.g. to check again a key missed a moment ago."""
+        ...
+
+    @abc.abstractmethod
+    def set(self, key: str, value: Any, ttl: float = None) -> None:
+        """Cache `value` for `ttl` seconds, forever if `ttl` is `None`."""
+        ...
+
+    @abc.abstractmethod
+    def clear(self) -> None:
+        """Drop all entries."""
+        ...
+
+    def close(self) -> None:
+        """Release resources held by the backend."""
+
+    def _over_limits(self, entries: int, size: int) -> bool:
+        return (
+                (self.max_entries is not None and entries > self.max_entries)
+                or (self.max_bytes is not None and size > self.max_bytes)
+        )
+
+
+@dataclass
+class _Entry:
+    value: Any
+    size: int
+    expires_at: float | None
+
+
+class MemoryCache(CacheBackend):
+    """In-process LRU cache."""
+
+    def __init__(self, max_entries: int = 4096, max_bytes: int = None):
+        super().__init__(max_entries, max_bytes)
+        self._entries: collections.OrderedDict[str, _Entry] = collections.OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def peek(self, key: str) -> Any | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at is not None and entry.expires_at <= time.time():
+                self._size -= self._entries.pop(key).size
+                self.stats.record(expirations=1)
+                entry = None
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry.value
+
+    def set(self, key: str, value: Any, ttl: float = None) -> None:
+        entry = _Entry(value, len(json.dumps(value)), time.time() + ttl if ttl is not None else None)
+        with self._lock:
+            if (old := self._entries.pop(key, None)) is not None:
+                self._size -= old.size
+            self._entries[key] = entry
+            self._size += entry.size
+            evicted = 0
+            while len(self._entries) > 1 and self._over_limits(len(self._entries), self._size):
+                self._size -= self._entries.popitem(last=False)[1].size
+                evicted += 1
+            self.stats.record(evictions=evicted)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+
+class SQLiteCache(CacheBackend):
+    """LRU cache persisted to an SQLite file, survives process restarts."""
+
+    def __init__(self, path: str, max_entries: int = 65536, max_bytes: int = None):
+        super().__init__(max_entries, max_bytes)
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " expires_at REAL,"
+            " accessed_at REAL NOT NULL"
+            ")"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_accessed_at ON entries (accessed_at)")
+
+    def peek(self, key: str) -> Any | None:
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT value, expires_at FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is not None and row[1] is not None and row[1] <= now:
+                self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self.stats.record(expirations=1)
+                row = None
+            if row is None:
+                return None
+            self._db.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any, ttl: float = None) -> None:
+        encoded = json.dumps(value)
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, encoded, len(encoded), now + ttl if ttl is not None else None, now),
+            )
+            entries, size = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+            evicted = 0
+            while entries > 1 and self._over_limits(entries, size):
+                oldest_key, oldest_size = self._db.execute(
+                    "SELECT key, size FROM entries ORDER BY accessed_at LIMIT 1"
+                ).fetchone()
+                self._db.execute("DELETE FROM entries WHERE key = ?", (oldest_key,))
+                entries, size = entries - 1, size - oldest_size
+                evicted += 1
+        self.stats.record(evictions=evicted)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM entries")
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,111 @@
+"""Adaptive limit of calls in flight."""
+from __future__ import annotations
+
+import contextlib
+import threading
+import time
+from typing import Iterator
+
+from framework.apis.metrics import Metrics
+from framework.apis.policy import RetryPolicy
+
+
+class AIMDLimiter:
+    """Limit of concurrent calls tuned by additive increase / multiplicative decrease.
+
+    Every successful call faster than `latency_target` raises the limit by `increase / limit`,
+    i.e. by `increase` per window of `limit` calls. A throttled, failed with 5xx or a connection error,
+    or too slow call cuts it by `decrease`, at most once per `cooldown` seconds since calls in flight
+    at the time of a cut report the same overload. Other errors leave the limit as is.
+    The limit is exposed as the `concurrency_limit` gauge of `metrics`, labeled with `name`.
+    A limiter built without `metrics` publishes to the metrics of the first API handler it is given to.
+    """
+
+    def __init__(
+            self,
+            initial: int = 4,
+            min_limit: int = 1,
+            max_limit: int = 64,
+            increase: float = 1.0,
+            decrease: float = 0.5,
+            latency_target: float = None,
+            cooldown: float = 1.0,
+            name: str = "default",
+            metrics: Metrics = None,
+    ):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_target = latency_target
+        self.cooldown = cooldown
+        self.name = name
+        self.metrics = metrics
+        self._limit = float(min(max(initial, min_limit), max_limit))
+        self._in_flight = 0
+        self._last_decrease = float("-inf")
+        self._condition = threading.Condition()
+        self._publish()
+
+    @property
+    def limit(self) -> int:
+        """Current number of calls allowed in flight."""
+        return int(self._limit)
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def attach_metrics(self, metrics: Metrics) -> None:
+        """Publish the limit to `metrics` unless the limiter already has its own."""
+        if self.metrics is None:
+            self.metrics = metrics
+            self._publish()
+
+    def _publish(self) -> None:
+        if self.metrics is not None:
+            self.metrics.set_gauge("concurrency_limit", self.limit, limiter=self.name)
+
+    def acquire(self) -> float:
+        """Wait for a free slot, return the start time to pass to `release`."""
+        with self._condition:
+            while self._in_flight >= self.limit:
+                self._condition.wait()
+            self._in_flight += 1
+        return time.monotonic()
+
+    def release(self, started: float, error: BaseException = None, adapt: bool = True) -> None:
+        """Free the slot taken at `started` by a call that failed with `error`, if any, and adapt the limit.
+
+        With `adapt` off the limit is left as is, e.g. for calls cancelled before they told anything.
+        """
+        latency = time.monotonic() - started
+        overloaded = adapt and (
+                (error is not None and RetryPolicy.classify(error) is not None)
+                or (self.latency_target is not None and latency > self.latency_target)
+        )
+        with self._condition:
+            self._in_flight -= 1
+            limit = self._limit
+            if overloaded:
+                now = time.monotonic()
+                if now - self._last_decrease >= self.cooldown:
+                    self._last_decrease = now
+                    self._limit = max(self.min_limit, self._limit * self.decrease)
+            elif adapt and error is None:
+                self._limit = min(self.max_limit, self._limit + self.increase / self._limit)
+            self._condition.notify_all()
+            changed = int(limit) != self.limit
+        if changed:
+            self._publish()
+
+    @contextlib.contextmanager
+    def slot(self) -> Iterator[None]:
+        """Hold a slot for the duration of the block, adapting to how the block ends."""
+        started = self.acquire()
+        try:
+            yield
+        except BaseException as e:
+            self.release(started, e)
+            raise
+        self.release(started)
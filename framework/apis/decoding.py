@@ -0,0 +1,35 @@
+"""JSON decoding of API responses, with orjson when it's installed."""
+from __future__ import annotations
+
+import json
+from typing import Any
+
+import requests
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def loads(data: bytes) -> Any:
+    """Decode a JSON document from raw bytes.
+
+    Raises:
+        ValueError: if `data` isn't valid JSON.
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def response_json(res: requests.Response) -> Any:
+    """Decoded body of `res`.
+
+    Unlike `Response.json`, the body is decoded straight from the received bytes:
+    no encoding guessing and no intermediate `str` copy of the whole body.
+
+    Raises:
+        ValueError: if the body isn't valid JSON.
+    """
+    return loads(res.content)
@@ -1,57 +1,223 @@
 """Dog CEO API."""
 
-import functools
-from typing import Callable, Sequence
-
-import requests
+import enum
+import re
+import threading
+from concurrent.futures import Future
+from typing import Any, Sequence
 
 from framework.apis.base import BaseApi
+from framework.apis.cache import CacheBackend, MemoryCache
+from framework.apis.concurrency import AIMDLimiter
+from framework.apis.decoding import response_json
+from framework.apis.metrics import Metrics
+from framework.apis.policy import RateLimiter, RetryPolicy
+from framework.apis.session import SessionConfig
+
+
+class RandomImageMode(enum.Enum):
+    """How the random image endpoints are cached."""
+    # Every call hits the network, as the endpoint intends.
+    FRESH = "fresh"
+    # Cached for the `random_image` TTL like any other endpoint.
+    CACHED = "cached"
+    # Resolved once per breed / sub breed and replayed forever, for reproducible runs.
+    # Pins persist between runs with a persistent cache such as `SQLiteCache`.
+    PINNED = "pinned"
 
 
 class DogCeoApi(BaseApi):
-    """Dog.Ceo API handler."""
+    """Dog.Ceo API handler.
+
+    Responses are cached in `cache` for `cache_ttls` seconds per endpoint kind.
+    Concurrent identical lookups of cached endpoints share a single request.
+    """
 
     # NOTE: данные в классе слишком простые чтоб строить поверх них dataclass модели как в Yandex Disk
     BASE_URL = "https://dog.ceo/api"
+    CACHE_TTLS = {
+        "catalog": 24 * 60 * 60,
+        "sub_breeds": 24 * 60 * 60,
+        "random_image": 60 * 60,
+        "pinned": None,
+    }
+    # Max images per request of the `/images/random/{n}` endpoints.
+    MAX_IMAGES_PER_REQUEST = 50
+    # Endpoint patterns collapsed into metrics labels, most specific first.
+    ENDPOINT_LABELS = (
+        (re.compile(r"^/breed/[^/]+/[^/]+/images/random/\d+$"), "/breed/{breed}/{sub_breed}/images/random/{n}"),
+        (re.compile(r"^/breed/[^/]+/images/random/\d+$"), "/breed/{breed}/images/random/{n}"),
+        (re.compile(r"^/breed/[^/]+/[^/]+/images/random$"), "/breed/{breed}/{sub_breed}/images/random"),
+        (re.compile(r"^/breed/[^/]+/images/random$"), "/breed/{breed}/images/random"),
+        (re.compile(r"^/breed/[^/]+/list$"), "/breed/{breed}/list"),
+    )
 
-    def _send_request(
+    def __init__(
             self,
-            method: Callable[..., requests.Response],
-            endpoint: str,
-            headers: dict[str, str] = None,
-            params: dict[str, str] = None,
-    ) -> requests.Response:
-        res = method(
-            f"{self.BASE_URL}{endpoint}",
-            headers=headers,
-            params=params,
+            session_config: SessionConfig = None,
+            base_url: str = None,
+            retry_policy: RetryPolicy = None,
+            rate_limiter: RateLimiter = None,
+            cache: CacheBackend = None,
+            cache_ttls: dict[str, float] = None,
+            random_images: RandomImageMode = RandomImageMode.FRESH,
+            bulk: bool = False,
+            metrics: Metrics = None,
+            concurrency: AIMDLimiter = None,
+    ):
+        super().__init__(
+            session_config=session_config,
+            base_url=base_url,
+            retry_policy=retry_policy,
+            rate_limiter=rate_limiter,
+            metrics=metrics,
+            concurrency=concurrency,
         )
-        res.raise_for_status()
-        return res
+        self.cache = cache if cache is not None else MemoryCache()
+        self.cache_ttls = self.CACHE_TTLS | (cache_ttls or {})
+        self.random_images = random_images
+        # NOTE: в bulk режиме всё дерево пород грузится одним запросом,
+        # а урлы подпород добываются одним запросом на породу.
+        self.bulk = bulk
+        self._catalog: dict[str, tuple[str, ...]] | None = None
+        # Cache key -> future of the request in flight for it.
+        self._in_flight: dict[str, Future] = {}
+        self._in_flight_lock = threading.Lock()
+
+    def close(self) -> None:
+        self.cache.close()
+        super().close()
+
+    def _endpoint_label(self, url: str) -> str:
+        endpoint = super()._endpoint_label(url)
+        for pattern, label in self.ENDPOINT_LABELS:
+            if pattern.match(endpoint):
+                return label
+        return endpoint
+
+    def _cache_key(self, endpoint: str) -> str:
+        return f"{self.BASE_URL}{endpoint}"
+
+    def _get_message(self, endpoint: str, kind: str = None) -> Any:
+        """`message` of the `endpoint` response, cached under the `kind` TTL if given.
+
+        Only cached lookups are coalesced: uncached ones, like fresh random images, are expected to differ.
+        """
+        if kind is None:
+            return response_json(self._send_request(self.session.get, endpoint))["message"]
+        key = self._cache_key(endpoint)
+        if (message := self.cache.get(key)) is not None:
+            return message
+        with self._in_flight_lock:
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = self._in_flight[key] = Future()
+        if not leader:
+            return future.result()
+        try:
+            # The previous leader may have finished between the cache miss and taking the lead.
+            if (message := self.cache.peek(key)) is None:
+                message = response_json(self._send_request(self.session.get, endpoint))["message"]
+                self.cache.set(key, message, self.cache_ttls.get(kind))
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(message)
+        finally:
+            with self._in_flight_lock:
+                del self._in_flight[key]
+        return message
+
+    @property
+    def catalog(self) -> dict[str, tuple[str, ...]]:
+        """All breeds with their sub breeds, loaded once."""
+        if self._catalog is None:
+            self.load_catalog()
+        return self._catalog
+
+    def load_catalog(self) -> dict[str, tuple[str, ...]]:
+        """(Re)load all breeds with their sub breeds in a single request."""
+        message = self._get_message("/breeds/list/all", "catalog")
+        self._catalog = {breed: tuple(sub_breeds) for breed, sub_breeds in message.items()}
+        return self._catalog
 
-    @functools.lru_cache
     def get_sub_breeds(self, breed: str) -> tuple[str, ...]:
-        """Get sub breeds of `breed`."""
-        return tuple(self._send_request(
-            requests.get,
-            f"/breed/{breed}/list",
-        ).json().get("message", []))
+        """Get sub breeds of `breed`, from the catalog in bulk mode.
+
+        Raises:
+            HTTPError: if `breed` does not exist.
+        """
+        if self.bulk and breed in self.catalog:
+            return self.catalog[breed]
+        return tuple(self._get_message(f"/breed/{breed}/list", "sub_breeds"))
+
+    @staticmethod
+    def _random_image_endpoint(breed: str, sub_breed: str = None) -> str:
+        return f"/breed/{breed}/{sub_breed}/images/random" if sub_breed else f"/breed/{breed}/images/random"
+
+    def _random_image_kind(self) -> str | None:
+        """Cache TTL kind of random images according to `random_images`."""
+        return {
+            RandomImageMode.FRESH: None,
+            RandomImageMode.CACHED: "random_image",
+            RandomImageMode.PINNED: "pinned",
+        }[self.random_images]
+
+    def get_url(self, breed: str, sub_breed: str = None) -> str:
+        """Get a random image url of `sub_breed` if given or `breed` itself, the pinned one in pinned mode."""
+        return self._get_message(self._random_image_endpoint(breed, sub_breed), self._random_image_kind())
+
+    def get_random_urls(self, breed: str, sub_breed: str = None, count: int = 1) -> tuple[str, ...]:
+        """Get up to `count` random image urls of `sub_breed` if given or `breed` itself in one request.
+
+        Images of a breed with sub breeds belong to all of its sub breeds.
+        """
+        count = min(count, self.MAX_IMAGES_PER_REQUEST)
+        endpoint = f"/breed/{breed}/{sub_breed}/images/random/{count}" if sub_breed \
+            else f"/breed/{breed}/images/random/{count}"
+        return tuple(self._get_message(endpoint))
 
-    @functools.lru_cache
     def get_urls(self, breed: str, sub_breeds: Sequence[str]) -> tuple[str, ...]:
-        """Get image urls for `sub_breeds` if any or `breed` itself."""
+        """Get image urls for `sub_breeds` if any or `breed` itself.
+
+        In bulk mode sub breed urls are picked from a single batch of breed images,
+        only sub breeds missing from the batch are requested one by one.
+        In pinned mode the batch is only requested if some sub breed isn't pinned yet, and picked urls get pinned.
+        """
+        if sub_breeds and self.bulk:
+            pinned = self.random_images is RandomImageMode.PINNED
+            by_sub_breed: dict[str, str] = {}
+            if pinned:
+                for sub_breed in sub_breeds:
+                    url = self.cache.get(self._cache_key(self._random_image_endpoint(breed, sub_breed)))
+                    if url is not None:
+                        by_sub_breed[sub_breed] = url
+            if len(by_sub_breed) < len(sub_breeds):
+                for url in self.get_random_urls(breed, count=self.MAX_IMAGES_PER_REQUEST):
+                    sub_breed = url.split('/')[-2].removeprefix(f"{breed}-")
+                    if sub_breed in sub_breeds and sub_breed not in by_sub_breed:
+                        by_sub_breed[sub_breed] = url
+                        if pinned:
+                            self.cache.set(
+                                self._cache_key(self._random_image_endpoint(breed, sub_breed)),
+                                url,
+                                self.cache_ttls.get("pinned"),
+                            )
+            return tuple(by_sub_breed.get(sub_breed) or self.get_url(breed, sub_breed) for sub_breed in sub_breeds)
         if sub_breeds:
-            return tuple(
-                self._send_request(
-                    requests.get,
-                    f"/breed/{breed}/{sub_breed}/images/random",
-                ).json()['message']
-                for sub_breed in sub_breeds
-            )
+            return tuple(self.get_url(breed, sub_breed) for sub_breed in sub_breeds)
         else:
-            return (
-                self._send_request(
-                    requests.get,
-                    f"/breed/{breed}/images/random",
-                ).json()['message'],
-            )
+            return (self.get_url(breed),)
+
+    def get_catalog_urls(self) -> dict[str, tuple[str, ...]]:
+        """Get image urls of every breed, see `get_urls`."""
+        return {breed: self.get_urls(breed, sub_breeds) for breed, sub_breeds in self.catalog.items()}
+
+
+def file_name_from_url(url: str) -> str:
+    """Derive a disk file name from an image url, e.g. `.../spaniel-cocker/n1.jpg` -> `spaniel-cocker_n1.jpg`."""
+    url_as_split = url.split('/')
+    file_name, specific_breed = url_as_split[-1], url_as_split[-2]
+    return '_'.join((specific_breed, file_name))
@@ -0,0 +1,236 @@
+"""Metrics of API requests and async operations."""
+from __future__ import annotations
+
+import abc
+import bisect
+import collections
+import json
+import math
+import os
+import threading
+import time
+from typing import Any, Iterable, Sequence
+
+# Upper bounds of latency histogram buckets, seconds.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, math.inf)
+
+Labels = tuple[tuple[str, str], ...]
+
+
+class Histogram:
+    """Cumulative-bucket histogram, Prometheus style."""
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the `q` quantile."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return self.buckets[-1]
+
+
+class MetricsSink(abc.ABC):
+    """Destination of metrics."""
+
+    def emit(self, event: dict[str, Any]) -> None:
+        """Receive a single event as it happens."""
+
+    def flush(self, metrics: Metrics) -> None:
+        """Receive the aggregated metrics, on `Metrics.flush`."""
+
+
+class MemorySink(MetricsSink):
+    """Keeps the last `max_events` events in memory."""
+
+    def __init__(self, max_events: int = 10_000):
+        self.events: collections.deque[dict[str, Any]] = collections.deque(maxlen=max_events)
+
+    def emit(self, event: dict[str, Any]) -> None:
+        self.events.append(event)
+
+
+class JsonLinesSink(MetricsSink):
+    """Appends every event to a JSON lines file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8")
+
+    def emit(self, event: dict[str, Any]) -> None:
+        line = json.dumps(event)
+        with self._lock:
+            self._file.write(line + "\n")
+
+    def flush(self, metrics: Metrics) -> None:
+        with self._lock:
+            self._file.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+class PrometheusTextSink(MetricsSink):
+    """Writes the aggregated metrics in the Prometheus text exposition format on flush,
+    e.g. for the node exporter textfile collector."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def flush(self, metrics: Metrics) -> None:
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(metrics.to_prometheus())
+        os.replace(tmp_path, self.path)
+
+
+def _labels(**labels: Any) -> Labels:
+    return tuple((name, str(value)) for name, value in labels.items())
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Labels, **extra: str) -> str:
+    pairs = [*labels, *extra.items()]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class Metrics:
+    """Thread safe aggregation of request and operation metrics, forwarded to `sinks`.
+
+    One instance may be shared by several API handlers, they are told apart by the `api` label.
+    """
+
+    def __init__(self, sinks: Iterable[MetricsSink] = ()):
+        self.sinks = list(sinks)
+        self._lock = threading.Lock()
+        self.latency: dict[Labels, Histogram] = collections.defaultdict(Histogram)
+        self.operation_wait: dict[Labels, Histogram] = collections.defaultdict(Histogram)
+        self.counters: dict[str, collections.Counter[Labels]] = collections.defaultdict(collections.Counter)
+        self.gauges: dict[str, dict[Labels, float]] = collections.defaultdict(dict)
+
+    def _emit(self, kind: str, **fields: Any) -> None:
+        if self.sinks:
+            event = {"ts": time.time(), "kind": kind, **fields}
+            for sink in self.sinks:
+                sink.emit(event)
+
+    def observe_request(
+            self,
+            api: str,
+            method: str,
+            endpoint: str,
+            status: int | None,
+            elapsed: float,
+            bytes_sent: int = 0,
+            bytes_received: int = 0,
+    ) -> None:
+        """Record a finished request, `status` is `None` if no response came."""
+        labels = _labels(api=api, method=method, endpoint=endpoint)
+        with self._lock:
+            self.latency[labels].observe(elapsed)
+            self.counters["api_responses_total"][labels + _labels(status=status or "none")] += 1
+            self.counters["api_bytes_sent_total"][labels] += bytes_sent
+            self.counters["api_bytes_received_total"][labels] += bytes_received
+        self._emit(
+            "request",
+            api=api,
+            method=method,
+            endpoint=endpoint,
+            status=status,
+            elapsed=elapsed,
+            bytes_sent=bytes_sent,
+            bytes_received=bytes_received,
+        )
+
+    def observe_retry(self, api: str, endpoint: str, reason: str, delay: float) -> None:
+        with self._lock:
+            self.counters["api_retries_total"][_labels(api=api, endpoint=endpoint, reason=reason)] += 1
+            self.counters["api_backoff_seconds_total"][_labels(api=api)] += delay
+        self._emit("retry", api=api, endpoint=endpoint, reason=reason, delay=delay)
+
+    def observe_throttling(self, api: str, seconds: float) -> None:
+        if not seconds:
+            return
+        with self._lock:
+            self.counters["api_throttled_seconds_total"][_labels(api=api)] += seconds
+        self._emit("throttling", api=api, seconds=seconds)
+
+    def observe_poll(self, status: str) -> None:
+        """Record a poll iteration of an async operation."""
+        with self._lock:
+            self.counters["operation_polls_total"][_labels(status=status)] += 1
+
+    def observe_operation(self, outcome: str, elapsed: float, polls: int) -> None:
+        """Record the time spent waiting on a finished async operation."""
+        with self._lock:
+            self.operation_wait[_labels(outcome=outcome)].observe(elapsed)
+        self._emit("operation", outcome=outcome, elapsed=elapsed, polls=polls)
+
+    def set_gauge(self, name: str, value: float, **labels: Any) -> None:
+        with self._lock:
+            self.gauges[name][_labels(**labels)] = value
+        self._emit("gauge", name=name, value=value, labels=labels)
+
+    def flush(self) -> None:
+        """Hand the aggregated metrics to all sinks."""
+        for sink in self.sinks:
+            sink.flush(self)
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        """Count, mean and p50/p99 latency per `api method endpoint`."""
+        with self._lock:
+            return {
+                " ".join(value for _, value in labels): {
+                    "count": histogram.count,
+                    "mean": histogram.sum / histogram.count,
+                    "p50": histogram.quantile(0.5),
+                    "p99": histogram.quantile(0.99),
+                }
+                for labels, histogram in self.latency.items()
+            }
+
+    def to_prometheus(self) -> str:
+        """Aggregated metrics in the Prometheus text exposition format."""
+        lines: list[str] = []
+        with self._lock:
+            for name, histograms in (
+                    ("api_request_duration_seconds", self.latency),
+                    ("operation_wait_seconds", self.operation_wait),
+            ):
+                lines.append(f"# TYPE {name} histogram")
+                for labels, histogram in histograms.items():
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        le = "+Inf" if bound == math.inf else repr(bound)
+                        lines.append(f"{name}_bucket{_format_labels(labels, le=le)} {cumulative}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {histogram.sum}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+            for name, counter in self.counters.items():
+                lines.append(f"# TYPE {name} counter")
+                lines.extend(f"{name}{_format_labels(labels)} {value}" for labels, value in counter.items())
+            for name, gauge in self.gauges.items():
+                lines.append(f"# TYPE {name} gauge")
+                lines.extend(f"{name}{_format_labels(labels)} {value}" for labels, value in gauge.items())
+        return "\n".join(lines) + "\n"
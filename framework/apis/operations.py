@@ -0,0 +1,247 @@
+"""Tracking of Yandex Disk async operations."""
+from __future__ import annotations
+
+import queue
+import random
+import threading
+import time
+from concurrent.futures import FIRST_EXCEPTION, Future, wait
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable
+
+import requests
+
+from framework.apis.metrics import Metrics
+
+
+class OperationFailedError(requests.HTTPError):
+    """An async operation finished with the `failed` status."""
+
+
+@dataclass(frozen=True)
+class PollBackoff:
+    """Delays between polls of one operation: fast at first, slower later, jittered."""
+    initial: float = 0.25
+    factor: float = 1.5
+    max_delay: float = 5.0
+    # Fraction of the delay randomly added or subtracted.
+    jitter: float = 0.2
+    # Total time an operation may take before failing with TimeoutError.
+    timeout: float = 60.0
+
+    def delay(self, polls: int) -> float:
+        """Delay before the poll following `polls` done polls."""
+        delay = min(self.max_delay, self.initial * self.factor ** polls)
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+
+@dataclass(eq=False)
+class _Operation:
+    endpoint: str
+    future: Future
+    submitted: float
+    deadline: float
+    next_poll: float
+    polls: int = 0
+
+
+class OperationTracker:
+    """Polls many async operations at once, scheduled by a single background thread.
+
+    `poll_status` returns the current status of an operation endpoint.
+    Due operations are polled concurrently, at most `max_parallel_polls` at once.
+    Poll iterations and wait times are recorded to `metrics`.
+    All threads are daemons, so polls in flight never hold up process shutdown.
+    """
+
+    def __init__(
+            self,
+            poll_status: Callable[[str], str],
+            backoff: PollBackoff = None,
+            max_parallel_polls: int = 8,
+            metrics: Metrics = None,
+    ):
+        self.poll_status = poll_status
+        self.backoff = backoff or PollBackoff()
+        self.max_parallel_polls = max_parallel_polls
+        self.metrics = metrics if metrics is not None else Metrics()
+        self._pending: list[_Operation] = []
+        self._condition = threading.Condition()
+        self._closed = False
+        self._thread: threading.Thread | None = None
+        # NOTE: не ThreadPoolExecutor -- его потоки join-ятся при выходе из интерпретатора.
+        self._pollers: list[threading.Thread] = []
+        # Due operations for the pollers, `None` stops a poller.
+        self._polls: queue.SimpleQueue[_Operation | None] = queue.SimpleQueue()
+
+    @property
+    def pending(self) -> int:
+        """Number of operations not finished yet."""
+        with self._condition:
+            return len(self._pending)
+
+    def submit(self, endpoint: str, callback: Callable[[Future], None] = None) -> Future:
+        """Start tracking `endpoint`.
+
+        The returned future resolves to `None` on success, raises `OperationFailedError` on failure
+        and `TimeoutError` if the operation outlives `backoff.timeout`.
+        """
+        future = Future()
+        if callback is not None:
+            future.add_done_callback(callback)
+        now = time.monotonic()
+        operation = _Operation(
+            endpoint=endpoint,
+            future=future,
+            submitted=now,
+            deadline=now + self.backoff.timeout,
+            next_poll=now + self.backoff.delay(0),
+        )
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Operation tracker is closed")
+            self._pending.append(operation)
+            if self._thread is None:
+                self._pollers = [
+                    threading.Thread(target=self._poll_loop, name=f"operation-poll-{i}", daemon=True)
+                    for i in range(self.max_parallel_polls)
+                ]
+                self._thread = threading.Thread(target=self._run, name="operation-tracker", daemon=True)
+                for thread in [*self._pollers, self._thread]:
+                    thread.start()
+            self._condition.notify()
+        return future
+
+    def close(self) -> None:
+        """Stop polling, unfinished operations are cancelled."""
+        with self._condition:
+            self._closed = True
+            for operation in self._pending:
+                operation.future.cancel()
+            self._pending.clear()
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join()
+            for _ in self._pollers:
+                self._polls.put(None)
+            for poller in self._pollers:
+                poller.join()
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._closed and not self._pending:
+                    self._condition.wait()
+                if self._closed:
+                    return
+                now = time.monotonic()
+                due = [operation for operation in self._pending if operation.next_poll <= now]
+                if not due:
+                    # Operations being polled are due never, until their poll is done.
+                    timeout = min(operation.next_poll for operation in self._pending) - now
+                    self._condition.wait(timeout if timeout != float("inf") else None)
+                    continue
+                for operation in due:
+                    operation.next_poll = float("inf")
+            for operation in due:
+                self._polls.put(operation)
+
+    def _poll_loop(self) -> None:
+        while (operation := self._polls.get()) is not None:
+            self._update(operation, self._poll(operation))
+            with self._condition:
+                # The next poll time is set, the tracker may have to wake up earlier.
+                self._condition.notify()
+
+    def _poll(self, operation: _Operation) -> str | Exception:
+        try:
+            return self.poll_status(operation.endpoint)
+        except Exception as e:
+            return e
+
+    def _update(self, operation: _Operation, status: str | Exception) -> None:
+        operation.polls += 1
+        self.metrics.observe_poll(status if isinstance(status, str) else "error")
+        if status == "success":
+            self._finish(operation)
+        elif status == "failed":
+            self._finish(operation, OperationFailedError(f"Operation {operation.endpoint} failed!"))
+        elif isinstance(status, Exception):
+            self._finish(operation, status)
+        elif time.monotonic() >= operation.deadline:
+            self._finish(operation, TimeoutError(
+                f"Operation {operation.endpoint} did not succeed after {operation.polls} polls"
+            ))
+        else:
+            operation.next_poll = time.monotonic() + self.backoff.delay(operation.polls)
+
+    def _finish(self, operation: _Operation, error: Exception = None) -> None:
+        with self._condition:
+            if operation not in self._pending:
+                # Cancelled by `close`.
+                return
+            self._pending.remove(operation)
+        self.metrics.observe_operation(
+            "success" if error is None else type(error).__name__,
+            time.monotonic() - operation.submitted,
+            operation.polls,
+        )
+        if error is None:
+            operation.future.set_result(None)
+        else:
+            operation.future.set_exception(error)
+
+
+class BackgroundWorker:
+    """Runs submitted calls one by one in a daemon thread.
+
+    Unlike executors, it never delays process shutdown: calls still pending at exit are dropped.
+    """
+
+    def __init__(self, name: str = "background-worker"):
+        self.name = name
+        self._calls: queue.SimpleQueue[tuple[Future, Callable[[], Any]]] = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+
+    def submit(self, func: Callable[[], Any]) -> Future:
+        """Schedule `func`, the future resolves to its result."""
+        future = Future()
+        self._calls.put((future, func))
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+        return future
+
+    def _run(self) -> None:
+        while True:
+            future, func = self._calls.get()
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(func())
+            except Exception as e:
+                future.set_exception(e)
+
+
+def done_future() -> Future:
+    """Already succeeded future, for requests finished without an async operation."""
+    future = Future()
+    future.set_result(None)
+    return future
+
+
+def wait_all(futures: Iterable[Future], timeout: float = None) -> None:
+    """Wait for all `futures`.
+
+    Raises:
+        Exception: the first failure among `futures`.
+        TimeoutError: if `timeout` expires first.
+    """
+    done, not_done = wait(tuple(futures), timeout=timeout, return_when=FIRST_EXCEPTION)
+    for future in done:
+        if future.exception() is not None:
+            raise future.exception()
+    if not_done:
+        raise TimeoutError(f"{len(not_done)} operations are still pending")
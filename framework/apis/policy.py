@@ -0,0 +1,198 @@
+"""Rate limiting and retry policies of the API handlers."""
+from __future__ import annotations
+
+import collections
+import datetime
+import email.utils
+import enum
+import itertools
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, TypeVar
+from urllib.parse import urlsplit
+
+import requests
+
+from framework.apis.operations import OperationFailedError
+
+_T = TypeVar("_T")
+
+
+class TokenBucket:
+    """Token bucket allowing `rate` acquisitions per second with bursts up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Take a token, sleeping until one is available. Returns the time slept."""
+        slept = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return slept
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+            slept += wait
+
+
+class RateLimiter:
+    """Per-host token buckets.
+
+    Hosts missing from `rates` use `default_rate`, `None` means unlimited.
+    """
+
+    def __init__(self, rates: dict[str, float] = None, default_rate: float = None, burst: float = None):
+        self.rates = rates or {}
+        self.default_rate = default_rate
+        self.burst = burst
+        self._buckets: dict[str, TokenBucket | None] = {}
+        # Host -> monotonic time until which nothing is sent to it.
+        self._paused_until: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, host: str) -> TokenBucket | None:
+        with self._lock:
+            if host not in self._buckets:
+                rate = self.rates.get(host, self.default_rate)
+                self._buckets[host] = TokenBucket(rate, self.burst) if rate else None
+            return self._buckets[host]
+
+    def acquire(self, url: str) -> float:
+        """Wait for the host of `url` to accept one more request. Returns the time slept."""
+        host = urlsplit(url).netloc
+        slept = 0.0
+        while (pause := self._paused_until.get(host, 0.0) - time.monotonic()) > 0:
+            time.sleep(pause)
+            slept += pause
+        if (bucket := self._bucket(host)) is not None:
+            slept += bucket.acquire()
+        return slept
+
+    def pause(self, url: str, seconds: float) -> None:
+        """Stop sending to the host of `url` for `seconds`, e.g. while it asks to retry later."""
+        host = urlsplit(url).netloc
+        with self._lock:
+            self._paused_until[host] = max(self._paused_until.get(host, 0.0), time.monotonic() + seconds)
+
+
+class RetryReason(enum.Enum):
+    """Why a request is worth retrying."""
+    THROTTLED = "throttled"  # 429
+    SERVER_ERROR = "server_error"  # 5xx
+    OPERATION_FAILED = "operation_failed"  # async operation finished with `failed`
+    CONNECTION_ERROR = "connection_error"
+
+
+@dataclass
+class RetryStats:
+    """Thread safe counters of retries and time spent waiting."""
+    retries: collections.Counter = field(default_factory=collections.Counter)
+    # Time slept in rate limiters.
+    throttled_time: float = 0.0
+    # Time slept between retries.
+    backoff_time: float = 0.0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def record_retry(self, reason: RetryReason, delay: float) -> None:
+        with self._lock:
+            self.retries[reason] += 1
+            self.backoff_time += delay
+
+    def record_throttling(self, seconds: float) -> None:
+        if seconds:
+            with self._lock:
+                self.throttled_time += seconds
+
+
+def retry_after(error: Exception) -> float | None:
+    """Seconds from the `Retry-After` header of the failed response, if any."""
+    response = getattr(error, "response", None)
+    if response is None or (value := response.headers.get("Retry-After")) is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (date - datetime.datetime.now(datetime.timezone.utc)).total_seconds())
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """Exponential backoff with full jitter for retryable failures."""
+    # Total attempts, including the first one.
+    max_attempts: int = 5
+    base_delay: float = 0.5
+    max_delay: float = 30.0
+    retry_on: frozenset[RetryReason] = frozenset(RetryReason)
+    respect_retry_after: bool = True
+
+    @staticmethod
+    def classify(error: Exception) -> RetryReason | None:
+        """Retry reason of `error`, `None` if it's not retryable at all."""
+        if isinstance(error, OperationFailedError):
+            return RetryReason.OPERATION_FAILED
+        if isinstance(error, (requests.ConnectionError, requests.Timeout)):
+            return RetryReason.CONNECTION_ERROR
+        response = getattr(error, "response", None)
+        if isinstance(error, requests.HTTPError) and response is not None:
+            if response.status_code == 429:
+                return RetryReason.THROTTLED
+            if response.status_code >= 500:
+                return RetryReason.SERVER_ERROR
+        return None
+
+    def delay(self, attempt: int, error: Exception = None) -> float:
+        """Delay before the attempt following failed `attempt` (counted from 1).
+
+        A `Retry-After` of the server is honored up to `max_delay`, since the delay also pauses the whole host.
+        """
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+        if self.respect_retry_after and error is not None and (after := retry_after(error)) is not None:
+            delay = min(max(delay, after), self.max_delay)
+        return delay
+
+    def should_retry(self, attempt: int, error: Exception) -> RetryReason | None:
+        """Retry reason if `error` of failed `attempt` deserves another attempt."""
+        if attempt >= self.max_attempts:
+            return None
+        reason = self.classify(error)
+        return reason if reason in self.retry_on else None
+
+    def run(
+            self,
+            func: Callable[..., _T],
+            *args,
+            stats: RetryStats = None,
+            on_retry: Callable[[Exception, float], None] = None,
+    ) -> _T:
+        """Call `func` until it succeeds or fails with a non-retryable error or attempts run out.
+
+        `on_retry` is called with the error and the delay before sleeping.
+        """
+        for attempt in itertools.count(1):
+            try:
+                return func(*args)
+            except Exception as e:
+                if (reason := self.should_retry(attempt, e)) is None:
+                    raise
+                delay = self.delay(attempt, e)
+                if stats is not None:
+                    stats.record_retry(reason, delay)
+                if on_retry is not None:
+                    on_retry(e, delay)
+                time.sleep(delay)
@@ -0,0 +1,37 @@
+"""Pooled HTTP sessions shared by the API handlers."""
+
+from dataclasses import dataclass
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+@dataclass(frozen=True)
+class SessionConfig:
+    """Connection pooling and timeout settings of an API handler."""
+    # Number of per-host pools kept alive by the session.
+    pool_connections: int = 10
+    # Max connections kept alive per host.
+    pool_maxsize: int = 10
+    # Block instead of opening a throw-away connection when the host pool is exhausted.
+    pool_block: bool = False
+    connect_timeout: float = 5.0
+    read_timeout: float = 30.0
+
+    @property
+    def timeout(self) -> tuple[float, float]:
+        """`timeout` argument for `requests`."""
+        return self.connect_timeout, self.read_timeout
+
+
+def build_session(config: SessionConfig) -> requests.Session:
+    """Build a keep-alive session with connection pools sized by `config`."""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=config.pool_connections,
+        pool_maxsize=config.pool_maxsize,
+        pool_block=config.pool_block,
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
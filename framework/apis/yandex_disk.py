@@ -4,13 +4,23 @@ from __future__ import annotations
 import abc
 import datetime
 import enum
-from dataclasses import dataclass, field
-from time import sleep
-from typing import Callable
+import itertools
+import threading
+from collections import defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field, replace
+from time import perf_counter, sleep
+from typing import Any, Callable, Iterable, Iterator, Sequence
 
 import requests
 
 from framework.apis.base import BaseApi
+from framework.apis.concurrency import AIMDLimiter
+from framework.apis.decoding import response_json
+from framework.apis.metrics import Metrics
+from framework.apis.operations import BackgroundWorker, OperationTracker, PollBackoff, done_future, wait_all
+from framework.apis.policy import RateLimiter, RetryPolicy, RetryReason
+from framework.apis.session import SessionConfig
 
 
 class ResourceType(enum.Enum):
@@ -19,8 +29,19 @@ class ResourceType(enum.Enum):
     FILE = "file"
 
 
+class UploadMode(enum.Enum):
+    """How `YaUploader` uploads a file from a url."""
+    # The disk fetches the url itself, the upload is an async operation.
+    URL = "url"
+    # Bytes are streamed from the url straight into the disk upload href, nothing to poll.
+    STREAM = "stream"
+    # STREAM for files larger than `YaUploader.stream_threshold` or of unknown size, URL otherwise.
+    AUTO = "auto"
+
+
 class IBuildableFromResponse(abc.ABC):
     """Interface that indicates that a class can be built from a web response."""
+    __slots__ = ()
 
     @classmethod
     @abc.abstractmethod
@@ -109,8 +130,9 @@ class Folder(BaseNode):
 
     @classmethod
     def build_from_response(cls, res: dict[str, str | dict]) -> 'Folder':
-        embedded = Embedded.build_from_response(res.pop("_embedded"))
-        return cls(embedded=embedded, **res)
+        # NOTE: `res` не мутируем -- его можно переиспользовать после сборки модели.
+        embedded = Embedded.build_from_response(res["_embedded"])
+        return cls(embedded=embedded, **{name: value for name, value in res.items() if name != "_embedded"})
 
 
 @dataclass
@@ -124,29 +146,251 @@ class Embedded(IBuildableFromResponse):
 
     @classmethod
     def build_from_response(cls, res: dict) -> Embedded:
-        items_raw: list = res.pop("items")
-        items: list[FolderItem] = []
-        if items_raw:
-            items = list(FolderItem.build_from_response(f) for f in items_raw)
+        build_item = FolderItem.build_from_response
         return cls(
-            items=items,
-            **res,
+            sort=res["sort"],
+            path=res["path"],
+            items=[build_item(item) for item in res["items"] or ()],
+            limit=res["limit"],
+            offset=res["offset"],
+            total=res["total"],
         )
 
 
+# NOTE: компактные модели -- для больших листингов: слоты вместо __dict__,
+# даты и тип конвертятся при первом обращении, exif/sizes/comment_ids остаются как пришли.
+# Отсутствующие поля -- None, поэтому годятся и для урезанных через `fields` ответов.
+class CompactNode(IBuildableFromResponse):
+    """Common fields of compact resources."""
+    __slots__ = (
+        "path",
+        "name",
+        "revision",
+        "resource_id",
+        "comment_ids",
+        "exif",
+        "_created",
+        "_modified",
+        "_type",
+    )
+
+    def __init__(self, res: dict):
+        get = res.get
+        self.path: str | None = get("path")
+        self.name: str | None = get("name")
+        self.revision: str | None = get("revision")
+        self.resource_id: str | None = get("resource_id")
+        self.comment_ids: dict[str, str] | None = get("comment_ids")
+        self.exif: dict | None = get("exif")
+        self._created: str | datetime.datetime | None = get("created")
+        self._modified: str | datetime.datetime | None = get("modified")
+        self._type: str | ResourceType | None = get("type")
+
+    @classmethod
+    def build_from_response(cls, res: dict):
+        return cls(res)
+
+    @property
+    def created(self) -> datetime.datetime | None:
+        if isinstance(self._created, str):
+            self._created = datetime.datetime.fromisoformat(self._created)
+        return self._created
+
+    @property
+    def modified(self) -> datetime.datetime | None:
+        if isinstance(self._modified, str):
+            self._modified = datetime.datetime.fromisoformat(self._modified)
+        return self._modified
+
+    @property
+    def type(self) -> ResourceType | None:
+        if isinstance(self._type, str):
+            self._type = ResourceType(self._type)
+        return self._type
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}(path={self.path!r})"
+
+
+class CompactFolderItem(CompactNode):
+    """Compact representation of a Yandex Disk Folder's item."""
+    __slots__ = (
+        "antivirus_status",
+        "file",
+        "media_type",
+        "preview",
+        "md5",
+        "sha256",
+        "mime_type",
+        "size",
+        "sizes",
+    )
+
+    def __init__(self, res: dict):
+        super().__init__(res)
+        get = res.get
+        self.antivirus_status: str | None = get("antivirus_status")
+        self.file: str | None = get("file")
+        self.media_type: str | None = get("media_type")
+        self.preview: str | None = get("preview")
+        self.md5: str | None = get("md5")
+        self.sha256: str | None = get("sha256")
+        self.mime_type: str | None = get("mime_type")
+        self.size: int | None = get("size")
+        self.sizes: list[dict] | None = get("sizes")
+
+
+class CompactEmbedded(IBuildableFromResponse):
+    """Compact page of a folder's items."""
+    __slots__ = ("sort", "path", "items", "limit", "offset", "total")
+
+    def __init__(self, res: dict):
+        get = res.get
+        self.sort: str | None = get("sort")
+        self.path: str | None = get("path")
+        self.items: list[CompactFolderItem] = [CompactFolderItem(item) for item in get("items") or ()]
+        self.limit: int | None = get("limit")
+        self.offset: int | None = get("offset")
+        self.total: int | None = get("total")
+
+    @classmethod
+    def build_from_response(cls, res: dict) -> CompactEmbedded:
+        return cls(res)
+
+
+class CompactFolder(CompactNode):
+    """Compact representation of a Yandex Disk folder."""
+    __slots__ = ("embedded",)
+
+    def __init__(self, res: dict):
+        super().__init__(res)
+        embedded = res.get("_embedded")
+        self.embedded: CompactEmbedded | None = CompactEmbedded(embedded) if embedded is not None else None
+
+
+@dataclass
+class FolderVerification:
+    """Expected file names checked against a folder."""
+    # Name -> projected item of every item in the folder.
+    items: dict[str, CompactFolderItem]
+    # Expected names missing from the folder or not being files.
+    missing: set[str]
+    # Names in the folder which aren't expected.
+    unexpected: set[str]
+
+    @property
+    def ok(self) -> bool:
+        return not self.missing and not self.unexpected
+
+
+@dataclass(frozen=True)
+class FolderVersion:
+    """State of a folder by `YaUploader.folder_version`, compared to tell whether its items changed."""
+    revision: str | None
+    total: int | None
+    # Name and revision of the most recently modified item, if any.
+    latest: tuple[str, str] | None
+
+
+class FolderCache:
+    """Thread safe set of disk folders known to exist, may be shared by several `YaUploader`s."""
+
+    def __init__(self):
+        self._paths = {"/"}
+        self._lock = threading.Lock()
+
+    def __contains__(self, path: str) -> bool:
+        path = _normalize_path(path)
+        with self._lock:
+            return path in self._paths
+
+    def add(self, path: str) -> None:
+        path = _normalize_path(path)
+        with self._lock:
+            self._paths.add(path)
+
+    def discard(self, path: str) -> None:
+        """Forget `path` along with all folders nested in it."""
+        path = _normalize_path(path)
+        prefix = path.rstrip("/") + "/"
+        with self._lock:
+            self._paths = {known for known in self._paths if known != path and not known.startswith(prefix)} | {"/"}
+
+
 class YaUploader(BaseApi):
     """Ya Disk API provider."""
     BASE_URL = "https://cloud-api.yandex.net/v1/disk"
+    STREAM_CHUNK_SIZE = 64 * 1024
+    # Item fields fetched to verify folders.
+    VERIFY_FIELDS = ("name", "type", "md5")
 
-    def __init__(self, token: str):
+    def __init__(
+            self,
+            token: str,
+            session_config: SessionConfig = None,
+            base_url: str = None,
+            poll_backoff: PollBackoff = None,
+            retry_policy: RetryPolicy = None,
+            rate_limiter: RateLimiter = None,
+            upload_mode: UploadMode = UploadMode.URL,
+            stream_threshold: int = 2 * 1024 * 1024,
+            background_clean_up: bool = False,
+            metrics: Metrics = None,
+            folder_cache: FolderCache = None,
+            concurrency: AIMDLimiter = None,
+            upload_concurrency: AIMDLimiter = None,
+    ):
+        super().__init__(
+            session_config=session_config,
+            base_url=base_url,
+            retry_policy=retry_policy,
+            rate_limiter=rate_limiter,
+            metrics=metrics,
+            concurrency=concurrency,
+        )
         self.token = token
+        self.upload_mode = upload_mode
+        # NOTE: по ридми сервер диска зависает именно на тяжелых картинках, их лучше стримить самим.
+        self.stream_threshold = stream_threshold
+        # Don't block on deletions when leaving the context.
+        self.background_clean_up = background_clean_up
         self.__created_folders = []
+        # NOTE: папки, про которые известно что они есть, повторно не создаются.
+        self.folder_cache = folder_cache if folder_cache is not None else FolderCache()
+        # Uploads in flight, until their operations end. Must not be the `concurrency` limiter,
+        # whose slots the upload requests take too.
+        self.upload_concurrency = upload_concurrency
+        if upload_concurrency is not None:
+            upload_concurrency.attach_metrics(self.metrics)
+        # NOTE: запросы и так ретраятся в `_send_request`, поверх них повторяем только упавшие операции.
+        self._operation_retry_policy = replace(
+            self.retry_policy,
+            retry_on=self.retry_policy.retry_on & {RetryReason.OPERATION_FAILED},
+        )
+        self.operations = OperationTracker(self._get_operation_status, poll_backoff, metrics=self.metrics)
+        # Runs uploads started without waiting which block on the client side: streams and size probes.
+        self._transfers: ThreadPoolExecutor | None = None
+        self._transfers_lock = threading.Lock()
 
     def __enter__(self):
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        self.clean_up()
+        if self.background_clean_up:
+            # The background clean up needs the session and the tracker, they are closed after it.
+            self.clean_up(background=True).add_done_callback(lambda _: self.close())
+            return
+        try:
+            self.clean_up()
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        with self._transfers_lock:
+            if self._transfers is not None:
+                self._transfers.shutdown(cancel_futures=True)
+        self.operations.close()
+        super().close()
 
     @property
     def oauth_token(self) -> str:
@@ -162,82 +406,552 @@ class YaUploader(BaseApi):
             'Authorization': self.oauth_token,
         }
 
-    def _send_request(
-            self,
-            method: Callable[..., requests.Response],
-            endpoint: str,
-            headers: dict[str, str] = None,
-            params: dict[str, str] = None,
-    ) -> requests.Response:
-        if headers is None:
-            headers = {}
-        if params is None:
-            params = {}
-
-        if not endpoint.startswith('/'):
-            endpoint = f'/{endpoint}'
-        res: requests.Response = method(
-            f"{self.BASE_URL}{endpoint}",
-            headers=headers | self._common_headers,
-            params=params,
-        )
-        res.raise_for_status()
-        return res
+    def _prepare_headers(self, headers: dict[str, str]) -> dict[str, str]:
+        return headers | self._common_headers
+
+    def _endpoint_label(self, url: str) -> str:
+        if not url.startswith(self.BASE_URL):
+            # Sources of stream uploads, their paths are unique per file.
+            return "{source}"
+        endpoint = super()._endpoint_label(url)
+        if endpoint.startswith("/operations/"):
+            return "/operations/{id}"
+        return endpoint
+
+    def _operation_endpoint(self, res: requests.Response) -> str | None:
+        """Endpoint of the async operation started by `res` if any."""
+        operation_url: str = response_json(res)["href"]
+        if "/disk/operations/" not in operation_url:
+            return None
+        return operation_url.removeprefix(self.BASE_URL)
+
+    def _get_operation_status(self, operation_endpoint: str) -> str:
+        """Current status of an async operation."""
+        return response_json(self._send_request(self.session.get, operation_endpoint))["status"]
+
+    def _submit_operation(self, res: requests.Response) -> Future:
+        """Track the async operation started by `res`, if any, in the background."""
+        if (operation_endpoint := self._operation_endpoint(res)) is None:
+            return done_future()
+        return self.operations.submit(operation_endpoint)
 
     def _wait_operation_success(self, res: requests.Response) -> None:
         """Wait for given API operation to succeed."""
-        operation_url: str = res.json()["href"]
-        if "/disk/operations/" not in operation_url:
-            return
-        operation_endpoint = operation_url.removeprefix(self.BASE_URL)
-        attempt = 1
-        attempts = 60
-        while attempt <= attempts:
-            if (status := self._send_request(requests.get, operation_endpoint).json()["status"]) == "success":
-                return
-            elif status == "failed":
-                raise requests.HTTPError(f"Failed for {res.url}!")
-            print(f"Current status: {status}\nAttempt: {attempt} / {attempts}")
-            sleep(1)
-            attempt += 1
-        raise TimeoutError(f"Creation did not not succeeded")
-
-    def create_folder(self, path: str) -> None:
-        """Creates a `path` folder."""
+        self._submit_operation(res).result()
+
+    def create_folder(self, path: str, wait: bool = True, track: bool = True) -> Future:
+        """Creates a `path` folder, unless it's known to exist already.
+
+        Folders created with `track` off are left in place by `clean_up`, e.g. targets of syncs and resumable jobs.
+        Returns the future of the creation, already done if `wait`.
+
+        Raises:
+            HTTPError: if the folder exists but isn't known to, or its parent is missing.
+        """
+        if path in self.folder_cache:
+            return done_future()
         res = self._send_request(
-            requests.put,
+            self.session.put,
             "/resources",
             params={"path": path},
         )
-        self._wait_operation_success(res)
-        self.__created_folders.append(path)
-
-    def upload_photos_to_yd(self, path: str, url_file: str, name: str) -> None:
-        """Upload photo to the `path` with name `name` from `url_file`."""
-        res = self._send_request(
-            requests.post,
+        if track:
+            self.__created_folders.append(path)
+        self.folder_cache.add(path)
+        future = self._submit_operation(res)
+        if wait:
+            future.result()
+        return future
+
+    def makedirs(self, *paths: str, track: bool = True) -> None:
+        """Create `paths` with all their missing parents, like `mkdir -p`.
+
+        Folders known to exist are skipped, the rest take a request each: level by level,
+        concurrently within a level. Folders which turn out to exist already are not an error.
+        `track` is passed to `create_folder`.
+
+        Raises:
+            HTTPError: if a folder can't be created.
+        """
+        levels: dict[int, set[str]] = defaultdict(set)
+        for path in paths:
+            parts = _normalize_path(path).split("/")[1:]
+            for depth in range(1, len(parts) + 1):
+                folder = "/" + "/".join(parts[:depth])
+                if parts[0] and folder not in self.folder_cache:
+                    levels[depth].add(folder)
+        for depth in sorted(levels):
+            folders = sorted(levels[depth])
+            with ThreadPoolExecutor(min(len(folders), self.session_config.pool_maxsize)) as pool:
+                wait_all(list(pool.map(lambda folder: self._make_folder(folder, track), folders)))
+
+    def _make_folder(self, path: str, track: bool = True) -> Future:
+        """Start creating `path`, a folder existing already counts as created."""
+        try:
+            return self.create_folder(path, wait=False, track=track)
+        except requests.HTTPError as e:
+            if e.response is None or e.response.status_code != 409 \
+                    or response_json(e.response).get("error") != "DiskPathPointsToExistentDirectoryError":
+                raise
+        self.folder_cache.add(path)
+        return done_future()
+
+    def _request_upload(self, path: str, url_file: str, name: str) -> requests.Response:
+        """Ask the disk to fetch `url_file` into `path` as `name`, don't wait for it."""
+        return self._send_request(
+            self.session.post,
             "/resources/upload",
             # Возможно тут можно юзать питоновый тру, скорее всего - нет.
             params={"path": f'/{path}/{name}', 'url': url_file, "overwrite": "true"},
         )
-        self._wait_operation_success(res)
 
-    def get_folder(self, folder_path: str) -> Folder:
-        """Get `folder_path` from the disk."""
+    def submit_upload(self, path: str, url_file: str, name: str) -> tuple[str | None, Future]:
+        """Ask the disk to fetch `url_file` into `path` as `name` without waiting for it.
+
+        Returns the endpoint of the started operation, `None` if the upload is done already,
+        and the future of the upload.
+        """
+        res = self._request_upload(path, url_file, name)
+        operation_endpoint = self._operation_endpoint(res)
+        if operation_endpoint is None:
+            return None, done_future()
+        return operation_endpoint, self.operations.submit(operation_endpoint)
+
+    def attach_operation(self, operation_endpoint: str) -> Future:
+        """Track an operation started earlier, e.g. by a previous run, by its endpoint."""
+        return self.operations.submit(operation_endpoint)
+
+    def _source_size(self, url_file: str) -> int | None:
+        """Size of `url_file` in bytes, if the source tells it. A source refusing HEAD tells nothing."""
+        try:
+            res = self._send_url(self.session.head, url_file, allow_redirects=True)
+        except requests.RequestException:
+            return None
+        size = res.headers.get("Content-Length")
+        return int(size) if size is not None else None
+
+    def _resolve_upload_mode(self, url_file: str, mode: UploadMode | None) -> UploadMode:
+        mode = mode or self.upload_mode
+        if mode is not UploadMode.AUTO:
+            return mode
+        size = self._source_size(url_file)
+        return UploadMode.URL if size is not None and size <= self.stream_threshold else UploadMode.STREAM
+
+    def _get_upload_href(self, path: str, name: str) -> str:
+        """Target url to PUT the content of `path`/`name` to."""
+        return response_json(self._send_request(
+            self.session.get,
+            "/resources/upload",
+            params={"path": f'/{path}/{name}', "overwrite": "true"},
+        ))["href"]
+
+    def _put_content(self, href: str, data: bytes | Iterator[bytes], size: int) -> None:
+        """PUT `data` of `size` bytes to an upload `href`."""
+        started = perf_counter()
+        res = None
+        try:
+            res = self.session.put(href, data=data, timeout=self.session_config.timeout)
+        finally:
+            self.metrics.observe_request(
+                type(self).__name__,
+                "PUT",
+                "{upload_href}",
+                res.status_code if res is not None else None,
+                perf_counter() - started,
+                bytes_sent=size,
+            )
+        res.raise_for_status()
+
+    def _stream_upload(self, path: str, url_file: str, name: str) -> None:
+        """Stream `url_file` into `path` as `name` chunk by chunk, never holding the whole file.
+
+        The transfer is retried according to `retry_policy`, the upload href request retries on its own.
+        """
+        href = self._get_upload_href(path, name)
+        self.retry_policy.run(
+            self._stream_to,
+            url_file,
+            href,
+            stats=self.stats,
+            on_retry=lambda error, delay: self._record_retry("{source}", error, delay),
+        )
+
+    def _stream_to(self, url_file: str, href: str) -> None:
+        """Stream `url_file` into an upload `href`."""
+        # A single attempt, the whole transfer is retried.
+        with self._send_request_once(self.session.get, url_file, {}, {}, stream=True) as source:
+            # NOTE: генератор в data -- requests шлёт его chunked-ом, не собирая файл в памяти.
+            self._put_content(
+                href,
+                source.iter_content(self.STREAM_CHUNK_SIZE),
+                int(source.headers.get("Content-Length", 0)),
+            )
+
+    def download(self, url: str) -> bytes:
+        """Fetch the content of a file at `url` of any host, e.g. a source image to hash.
+
+        Retried, rate limited and recorded like every request.
+
+        Raises:
+            HTTPError: if any unexpected status occurs.
+        """
+        return self._send_url(self.session.get, url).content
+
+    def upload_content(self, path: str, name: str, content: bytes) -> None:
+        """Upload `content` already at hand to `path` as `name`, retried according to `retry_policy`."""
+        with self._slot(self.upload_concurrency):
+            href = self._get_upload_href(path, name)
+            self.retry_policy.run(
+                self._put_content,
+                href,
+                content,
+                len(content),
+                stats=self.stats,
+                on_retry=lambda error, delay: self._record_retry("{upload_href}", error, delay),
+            )
+
+    def copy(self, from_path: str, path: str, wait: bool = True) -> Future:
+        """Copy `from_path` to `path` on the disk side, overwriting `path`.
+
+        Returns the future of the copy, already done if `wait`.
+
+        Raises:
+            HTTPError: if `from_path` doesn't exist or the parent of `path` is missing.
+        """
+        res = self._send_request(
+            self.session.post,
+            "/resources/copy",
+            params={"from": from_path, "path": path, "overwrite": "true"},
+        )
+        future = self._submit_operation(res)
+        if wait:
+            future.result()
+        return future
+
+    def upload_photos_to_yd(
+            self,
+            path: str,
+            url_file: str,
+            name: str,
+            wait: bool = True,
+            mode: UploadMode = None,
+    ) -> Future:
+        """Upload photo to the `path` with name `name` from `url_file`.
+
+        `mode` defaults to `upload_mode`. Without `wait`, stream uploads and size probes of `UploadMode.AUTO`
+        run on a pool of `session_config.pool_maxsize` threads, so that many uploads go on at once.
+        Requests are retried according to `retry_policy`, failed operations are resubmitted only if `wait`.
+        Returns the future of the upload, already done if `wait`.
+        """
+        mode = mode or self.upload_mode
+        if not wait:
+            if mode is UploadMode.URL:
+                return self._submit_url_upload(path, url_file, name)
+            return self._submit_transfer(path, url_file, name, mode)
+        if self._resolve_upload_mode(url_file, mode) is UploadMode.STREAM:
+            self._upload_streamed(path, url_file, name)
+            return done_future()
+
+        def upload() -> Future:
+            future = self._submit_url_upload(path, url_file, name)
+            future.result()
+            return future
+
+        return self._operation_retry_policy.run(
+            upload,
+            stats=self.stats,
+            on_retry=lambda error, delay: self._record_retry("/resources/upload", error, delay),
+        )
+
+    def _upload_streamed(self, path: str, url_file: str, name: str) -> None:
+        with self._slot(self.upload_concurrency):
+            self._stream_upload(path, url_file, name)
+
+    def _submit_transfer(self, path: str, url_file: str, name: str, mode: UploadMode) -> Future:
+        """Resolve `mode` and upload on the transfers pool, the future resolves once the upload is done."""
+        upload = Future()
+
+        def transfer() -> None:
+            try:
+                if self._resolve_upload_mode(url_file, mode) is UploadMode.STREAM:
+                    self._upload_streamed(path, url_file, name)
+                    upload.set_result(None)
+                    return
+                operation = self._submit_url_upload(path, url_file, name)
+            except Exception as e:
+                upload.set_exception(e)
+                return
+            operation.add_done_callback(lambda done: _copy_outcome(done, upload))
+
+        with self._transfers_lock:
+            if self._transfers is None:
+                self._transfers = ThreadPoolExecutor(
+                    self.session_config.pool_maxsize,
+                    thread_name_prefix="disk-transfer",
+                )
+            task = self._transfers.submit(transfer)
+        # Dropped by `close` before it started.
+        task.add_done_callback(lambda done: upload.cancel() if done.cancelled() else None)
+        return upload
+
+    def _submit_url_upload(self, path: str, url_file: str, name: str) -> Future:
+        """Start a URL upload holding an `upload_concurrency` slot, if any, until its operation ends."""
+        limiter = self.upload_concurrency
+        if limiter is None:
+            return self._submit_operation(self._request_upload(path, url_file, name))
+        started = limiter.acquire()
+        try:
+            future = self._submit_operation(self._request_upload(path, url_file, name))
+        except Exception as e:
+            limiter.release(started, e)
+            raise
+        future.add_done_callback(lambda done: limiter.release(
+            started,
+            None if done.cancelled() else done.exception(),
+            # Cancelled by `close`, the operation told nothing about the disk's load.
+            adapt=not done.cancelled(),
+        ))
+        return future
+
+    def upload_many(
+            self,
+            path: str,
+            files: Iterable[tuple[str, str]],
+            timeout: float = None,
+            mode: UploadMode = None,
+    ) -> None:
+        """Upload `(url_file, name)` pairs to `path`, waiting for all uploads at once.
+
+        Uploads whose operations failed are resubmitted together according to `retry_policy`.
+
+        Raises:
+            HTTPError: the first upload failed for good.
+            TimeoutError: if an attempt is not done within `timeout`.
+        """
+        files = list(files)
+        for attempt in itertools.count(1):
+            uploads: dict[Future, tuple[str, str]] = {}
+            try:
+                for url_file, name in files:
+                    future = self.upload_photos_to_yd(path, url_file, name, wait=False, mode=mode)
+                    uploads[future] = (url_file, name)
+            except Exception:
+                # Uploads started already are not left running behind the caller's back.
+                wait(uploads, timeout)
+                raise
+            wait(uploads, timeout)
+            if pending := [future for future in uploads if not future.done()]:
+                raise TimeoutError(f"{len(pending)} uploads are still pending")
+            failed = [future for future in uploads if future.exception() is not None]
+            if not failed:
+                return
+            sleep(self.operation_retry_delay(attempt, [future.exception() for future in failed]))
+            files = [uploads[future] for future in failed]
+
+    def operation_retry_delay(self, attempt: int, errors: Sequence[Exception]) -> float:
+        """Delay before resubmitting uploads whose operations failed with `errors` on `attempt`.
+
+        The uploads wait out a single delay together, their retries are recorded to `stats` and `metrics`.
+
+        Raises:
+            Exception: the first of `errors` not to be retried.
+        """
+        reasons = [self._operation_retry_policy.should_retry(attempt, error) for error in errors]
+        if None in reasons:
+            raise errors[reasons.index(None)]
+        delay = self._operation_retry_policy.delay(attempt, errors[0])
+        for index, (reason, error) in enumerate(zip(reasons, errors)):
+            error_delay = delay if index == 0 else 0.0
+            self.stats.record_retry(reason, error_delay)
+            self._record_retry("/resources/upload", error, error_delay)
+        return delay
+
+    def get_folder(self, folder_path: str, compact: bool = False) -> Folder | CompactFolder:
+        """Get `folder_path` from the disk, as compact models if `compact`."""
         res = self._send_request(
-            requests.get,
+            self.session.get,
             "/resources",
             params={"path": folder_path},
         )
-        return Folder.build_from_response(res.json())
+        if compact:
+            return CompactFolder.build_from_response(response_json(res))
+        return Folder.build_from_response(response_json(res))
+
+    def folder_version(self, folder_path: str) -> FolderVersion:
+        """Version of `folder_path`: its revision, number of items and its most recently modified item.
+
+        Costs a single request with a tiny projected response whatever the folder size.
+        The version changes once an item is added or removed, which changes the number of items,
+        or once a file is overwritten, which makes it the latest item with a new revision of its own.
+        The folder's own revision is not relied on: the disk doesn't promise to bump it on changes of its items.
+        Changes within the same second of `modified` may go unnoticed if another item wins the tie.
+        """
+        res = self._send_request(
+            self.session.get,
+            "/resources",
+            params={
+                "path": folder_path,
+                "fields": "revision,_embedded.total,_embedded.items.name,_embedded.items.revision",
+                "sort": "-modified",
+                "limit": "1",
+            },
+        )
+        payload = response_json(res)
+        embedded = payload.get("_embedded", {})
+        latest = [(item.get("name"), item.get("revision")) for item in embedded.get("items", [])]
+        return FolderVersion(payload.get("revision"), embedded.get("total"), latest[0] if latest else None)
+
+    def verify_folder(
+            self,
+            folder_path: str,
+            expected: Iterable[str],
+            items: dict[str, CompactFolderItem] = None,
+    ) -> FolderVerification:
+        """Check that `folder_path` holds exactly the `expected` files.
+
+        Takes a single listing projected to `VERIFY_FIELDS`, or none if its `items` are given.
+        """
+        if items is None:
+            items = {item.name: item for item in self.iter_folder(folder_path, fields=self.VERIFY_FIELDS)}
+        expected = set(expected)
+        return FolderVerification(
+            items=items,
+            missing={name for name in expected if name not in items or items[name].type is not ResourceType.FILE},
+            unexpected=set(items) - expected,
+        )
 
-    def clean_up(self):
-        """Clean up all folders created by this instance."""
-        for folder in self.__created_folders:
+    def iter_folder(
+            self,
+            folder_path: str,
+            page_size: int = 1000,
+            fields: Sequence[str] = None,
+            prefetch: bool = True,
+            item_factory: Callable[[dict], Any] = None,
+    ) -> Iterator[Any]:
+        """Lazily iterate over items of `folder_path`, page by page.
+
+        Only `fields` of the items are fetched if given. Items are built by `item_factory`,
+        which defaults to `FolderItem.build_from_response`, or to `CompactFolderItem` for projected items
+        since `FolderItem` needs all the fields.
+        With `prefetch` the next page is fetched while the current one is consumed.
+        """
+        if item_factory is None:
+            item_factory = FolderItem.build_from_response if fields is None else CompactFolderItem
+        params = {"path": folder_path, "limit": str(page_size)}
+        if fields is not None:
+            params["fields"] = ",".join(f"_embedded.items.{field}" for field in fields)
+
+        def fetch_page(offset: int) -> list[dict]:
+            res = self._send_request(self.session.get, "/resources", params=params | {"offset": str(offset)})
+            return response_json(res).get("_embedded", {}).get("items", [])
+
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="folder-prefetch") as prefetcher:
+            offset = 0
+            page = prefetcher.submit(fetch_page, offset)
+            while True:
+                items = page.result()
+                offset += len(items)
+                if len(items) == page_size and prefetch:
+                    page = prefetcher.submit(fetch_page, offset)
+                for item in items:
+                    yield item_factory(item)
+                if len(items) < page_size:
+                    return
+                if not prefetch:
+                    page = prefetcher.submit(fetch_page, offset)
+
+    def _delete(self, path: str) -> Future:
+        """Permanently delete `path`, a missing path counts as deleted."""
+        self.folder_cache.discard(path)
+        try:
             res = self._send_request(
-                requests.delete,
+                self.session.delete,
                 "/resources",
-                params={"path": folder, "permanently": "true", }
+                params={"path": path, "permanently": "true", }
             )
-            if res.status_code != 204:
-                self._wait_operation_success(res)
+        except requests.HTTPError as e:
+            if e.response is not None and e.response.status_code == 404:
+                return done_future()
+            raise
+        return self._submit_operation(res) if res.status_code != 204 else done_future()
+
+    def clean_up(self, background: bool = False) -> Future:
+        """Clean up all folders created by this instance.
+
+        Folders inside other created folders go away with their parent, the rest are deleted
+        concurrently and all deletions are awaited at once.
+        With `background` deletions are sent one by one from a daemon worker which never blocks process shutdown,
+        the instance must not be closed before the returned future is done.
+        """
+        folders = _outermost_paths(self.__created_folders)
+        self.__created_folders = []
+        if background:
+            # NOTE: без ThreadPoolExecutor -- его потоки join-ятся при выходе и держали бы процесс до конца DELETE.
+            return _cleaner.submit(lambda: wait_all([self._delete(folder) for folder in folders]))
+        self._delete_all(folders)
+        return done_future()
+
+    def _delete_all(self, folders: list[str]) -> None:
+        if not folders:
+            return
+        with ThreadPoolExecutor(min(len(folders), self.session_config.pool_maxsize)) as pool:
+            deletions = list(pool.map(self._delete, folders))
+        wait_all(deletions)
+
+
+class FolderWatcher:
+    """Projected items of a disk folder for monitoring loops, re-listed only once the folder changes.
+
+    An unchanged folder costs a single tiny request per `refresh`, see `YaUploader.folder_version`.
+    """
+
+    def __init__(self, disk_api: YaUploader, folder_path: str, fields: Sequence[str] = YaUploader.VERIFY_FIELDS):
+        self.disk_api = disk_api
+        self.folder_path = folder_path
+        self.fields = fields
+        self.version: FolderVersion | None = None
+        # Name -> projected item.
+        self.items: dict[str, CompactFolderItem] = {}
+
+    def refresh(self) -> bool:
+        """Re-list the folder if it changed since the last refresh, return whether it did."""
+        version = self.disk_api.folder_version(self.folder_path)
+        if version == self.version:
+            return False
+        # NOTE: версию берём до листинга -- изменение между ними просто вызовет лишний перелистинг.
+        self.items = {item.name: item for item in self.disk_api.iter_folder(self.folder_path, fields=self.fields)}
+        self.version = version
+        return True
+
+    def verify(self, expected: Iterable[str]) -> FolderVerification:
+        """Check the folder holds exactly the `expected` files, re-listing it only if it changed."""
+        self.refresh()
+        return self.disk_api.verify_folder(self.folder_path, expected, self.items)
+
+
+def _copy_outcome(source: Future, target: Future) -> None:
+    """Resolve `target` the way `source` is resolved."""
+    if source.cancelled():
+        target.cancel()
+    elif source.exception() is not None:
+        target.set_exception(source.exception())
+    else:
+        target.set_result(source.result())
+
+
+def _normalize_path(path: str) -> str:
+    """`path` as `/a/b`, without the `disk:` scheme and trailing slashes."""
+    return "/" + path.removeprefix("disk:").strip("/")
+
+
+def _outermost_paths(paths: Iterable[str]) -> list[str]:
+    """`paths` without duplicates and paths nested in other ones."""
+    outermost: list[str] = []
+    for path in sorted({_normalize_path(path) for path in paths}):
+        if not any(path == parent or path.startswith(parent.rstrip("/") + "/") for parent in outermost):
+            outermost.append(path)
+    return outermost
+
+
+# NOTE: один воркер на процесс -- фоновые удаления не должны плодить потоки.
+_cleaner = BackgroundWorker("yandex-disk-clean-up")
@@ -0,0 +1,197 @@
+"""Deduplication of uploads by source url and content hash, with disk-side copies."""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Iterable
+
+import requests
+
+from framework.apis.operations import wait_all
+from framework.apis.yandex_disk import YaUploader
+
+
+class DedupIndex:
+    """Disk paths of uploaded files by source url and by content md5.
+
+    Persisted as JSON between runs if `path` is given.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path
+        self.by_url: dict[str, str] = {}
+        self.by_md5: dict[str, str] = {}
+        self._lock = threading.Lock()
+        if path is not None and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            self.by_url, self.by_md5 = data["urls"], data["md5"]
+
+    def add(self, disk_path: str, url: str, md5: str = None) -> None:
+        with self._lock:
+            self.by_url[url] = disk_path
+            if md5 is not None:
+                self.by_md5[md5] = disk_path
+
+    def forget(self, disk_path: str) -> None:
+        """Drop all entries of `disk_path`, e.g. once it turns out to be deleted."""
+        with self._lock:
+            self.by_url = {url: path for url, path in self.by_url.items() if path != disk_path}
+            self.by_md5 = {md5: path for md5, path in self.by_md5.items() if path != disk_path}
+
+    def save(self) -> None:
+        """Atomically write the index, if it has a `path`."""
+        if self.path is None:
+            return
+        with self._lock:
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"urls": self.by_url, "md5": self.by_md5}, f)
+            os.replace(tmp_path, self.path)
+
+
+@dataclass
+class DedupReport:
+    """Disk paths of a deduplicated upload by the way they got there."""
+    uploaded: list[str] = field(default_factory=list)
+    # Copied on the disk side from a known file with the same source or content.
+    copied: list[str] = field(default_factory=list)
+    # The very same file was there already.
+    skipped: list[str] = field(default_factory=list)
+
+
+def _disk_path(path: str, name: str) -> str:
+    return f"/{path.strip('/')}/{name}"
+
+
+def _name(disk_path: str) -> str:
+    return disk_path.rsplit("/", 1)[-1]
+
+
+class DedupUploader:
+    """Uploads `(url, name)` files with `disk_api`, never fetching a known image again.
+
+    A file whose source url, or with `hash_content` its content md5, is in `index` is copied
+    on the disk side from the known file. With `hash_content` images are downloaded here to be hashed
+    and their content is uploaded as is, so that nothing is fetched twice.
+    """
+
+    def __init__(self, disk_api: YaUploader, index: DedupIndex = None, hash_content: bool = False):
+        self.disk_api = disk_api
+        self.index = index if index is not None else DedupIndex()
+        self.hash_content = hash_content
+
+    def upload_many(self, path: str, files: Iterable[tuple[str, str]]) -> DedupReport:
+        """Upload `(url, name)` pairs to `path`, copying duplicates instead of uploading them.
+
+        Raises:
+            HTTPError: an upload or a copy failed for good.
+        """
+        report = DedupReport()
+        # Disk path -> the disk path to copy it from and its source url.
+        copies: dict[str, tuple[str, str]] = {}
+        # Url -> disk path it's uploaded to by this call.
+        originals: dict[str, str] = {}
+        # Url -> disk path it's known to be at already, if the file is still there.
+        present: dict[str, str] = {}
+        planned: set[str] = set()
+        for url, name in files:
+            target = _disk_path(path, name)
+            if target in planned:
+                # A repeated pair, or another url for the same name: the first one wins.
+                continue
+            planned.add(target)
+            if url in originals:
+                copies[target] = (originals[url], url)
+            elif (source := self.index.by_url.get(url)) == target:
+                present[url] = target
+            elif source is not None:
+                copies[target] = (source, url)
+            else:
+                originals[url] = target
+
+        if present:
+            names = self._names(path)
+            for url, target in present.items():
+                if _name(target) in names:
+                    report.skipped.append(target)
+                else:
+                    # NOTE: файл удалили с диска мимо индекса -- забываем его и заливаем заново.
+                    self.index.forget(target)
+                    originals[url] = target
+
+        if self.hash_content:
+            self._upload_hashed(path, originals, copies, report)
+        else:
+            self.disk_api.upload_many(path, ((url, _name(target)) for url, target in originals.items()))
+            for url, target in originals.items():
+                self.index.add(target, url)
+            report.uploaded.extend(originals.values())
+        self._copy_all(path, copies, report)
+        self.index.save()
+        return report
+
+    def _names(self, path: str) -> set[str]:
+        """Names of the items in `path` with a single projected listing, none if it does not exist."""
+        try:
+            return {item.name for item in self.disk_api.iter_folder(path, fields=("name",))}
+        except requests.HTTPError as e:
+            if e.response is not None and e.response.status_code == 404:
+                return set()
+            raise
+
+    def _upload_hashed(
+            self,
+            path: str,
+            originals: dict[str, str],
+            copies: dict[str, tuple[str, str]],
+            report: DedupReport,
+    ) -> None:
+        """Upload the content of `originals` unless it's known, files with known or repeated content go to `copies`.
+
+        Images are downloaded and uploaded a chunk of `pool_maxsize` at a time, so that only that many are held.
+        """
+        pool_size = self.disk_api.session_config.pool_maxsize
+        # Md5 -> disk path its content is uploaded to by this call.
+        uploading: dict[str, str] = {}
+        pending = list(originals.items())
+        with ThreadPoolExecutor(pool_size) as pool:
+            for start in range(0, len(pending), pool_size):
+                chunk = pending[start:start + pool_size]
+                uploads: dict[Future, tuple[str, str, str]] = {}
+                for (url, target), content in zip(chunk, pool.map(self.disk_api.download, [url for url, _ in chunk])):
+                    md5 = hashlib.md5(content).hexdigest()
+                    if md5 in uploading:
+                        copies[target] = (uploading[md5], url)
+                    elif (source := self.index.by_md5.get(md5)) is not None and source != target:
+                        copies[target] = (source, url)
+                    else:
+                        uploading[md5] = target
+                        upload = pool.submit(self.disk_api.upload_content, path, _name(target), content)
+                        uploads[upload] = (target, url, md5)
+                wait_all(uploads)
+                for target, url, md5 in uploads.values():
+                    self.index.add(target, url, md5)
+                    report.uploaded.append(target)
+
+    def _copy_all(self, path: str, copies: dict[str, tuple[str, str]], report: DedupReport) -> None:
+        """Copy `copies` on the disk side, uploading those whose source is gone from the disk."""
+        futures: list[Future] = []
+        for target, (source, url) in copies.items():
+            try:
+                futures.append(self.disk_api.copy(source, target, wait=False))
+            except requests.HTTPError as e:
+                if e.response is None or e.response.status_code != 404:
+                    raise
+                # NOTE: источник удалили с диска мимо индекса -- забываем его и заливаем заново.
+                self.index.forget(source)
+                self.disk_api.upload_photos_to_yd(path, url, _name(target))
+                report.uploaded.append(target)
+            else:
+                report.copied.append(target)
+            self.index.add(target, url)
+        wait_all(futures)
@@ -0,0 +1,209 @@
+"""Resumable breed uploads backed by an append-only JSON lines journal."""
+from __future__ import annotations
+
+import enum
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future, wait
+from dataclasses import dataclass, field
+from typing import Any, Iterable
+
+import requests
+
+from framework.apis.dog_ceo import DogCeoApi, file_name_from_url
+from framework.apis.yandex_disk import YaUploader
+
+
+class JournalStage(enum.Enum):
+    """Stage an item of a job reached."""
+    # Image urls of a breed are known.
+    RESOLVED = "resolved"
+    # The upload is started, the disk works on it under the recorded operation.
+    SUBMITTED = "submitted"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
+@dataclass
+class FileState:
+    """Latest known state of a file to upload."""
+    stage: JournalStage
+    url: str
+    # Endpoint of the upload operation, if the upload was submitted as one.
+    operation: str | None = None
+    error: str | None = None
+
+
+class Journal:
+    """Append-only record of job progress, replayed on open.
+
+    Every change is a JSON line flushed right away, so that a crash loses at most the line being written,
+    which is skipped on replay.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        # Breed -> its image urls.
+        self.resolved: dict[str, list[str]] = {}
+        # File name -> its latest state.
+        self.files: dict[str, FileState] = {}
+        self._lock = threading.Lock()
+        line = "\n"
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        self._apply(json.loads(line))
+                    except ValueError:
+                        # NOTE: недописанная при падении строка.
+                        continue
+        self._file = open(path, "a", encoding="utf-8")
+        if not line.endswith("\n"):
+            # Records must not be glued to the broken line.
+            self._file.write("\n")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+    def _apply(self, record: dict[str, Any]) -> None:
+        stage = JournalStage(record["stage"])
+        if stage is JournalStage.RESOLVED:
+            self.resolved[record["breed"]] = record["urls"]
+        else:
+            self.files[record["name"]] = FileState(stage, record["url"], record.get("operation"), record.get("error"))
+
+    def _append(self, record: dict[str, Any]) -> None:
+        line = json.dumps(record | {"ts": time.time()})
+        with self._lock:
+            self._apply(record)
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def record_resolved(self, breed: str, urls: Iterable[str]) -> None:
+        self._append({"stage": JournalStage.RESOLVED.value, "breed": breed, "urls": list(urls)})
+
+    def record_submitted(self, name: str, url: str, operation: str | None) -> None:
+        self._append({"stage": JournalStage.SUBMITTED.value, "name": name, "url": url, "operation": operation})
+
+    def record_completed(self, name: str, url: str) -> None:
+        self._append({"stage": JournalStage.COMPLETED.value, "name": name, "url": url})
+
+    def record_failed(self, name: str, url: str, error: Exception) -> None:
+        self._append({
+            "stage": JournalStage.FAILED.value,
+            "name": name,
+            "url": url,
+            "error": f"{type(error).__name__}: {error}",
+        })
+
+    def compact(self) -> None:
+        """Atomically rewrite the journal to only the latest state of every item."""
+        with self._lock:
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for breed, urls in self.resolved.items():
+                    f.write(json.dumps({"stage": JournalStage.RESOLVED.value, "breed": breed, "urls": urls}) + "\n")
+                for name, state in self.files.items():
+                    f.write(json.dumps({
+                        "stage": state.stage.value,
+                        "name": name,
+                        "url": state.url,
+                        "operation": state.operation,
+                        "error": state.error,
+                    }) + "\n")
+            self._file.close()
+            os.replace(tmp_path, self.path)
+            self._file = open(self.path, "a", encoding="utf-8")
+
+
+@dataclass
+class JobReport:
+    """Outcome of a journaled run, by file name."""
+    completed: list[str] = field(default_factory=list)
+    # Completed by previous runs.
+    skipped: list[str] = field(default_factory=list)
+    # Operations of previous runs waited for instead of uploading again.
+    reattached: list[str] = field(default_factory=list)
+    failed: list[str] = field(default_factory=list)
+
+
+def run_journaled(
+        dog_api: DogCeoApi,
+        disk_api: YaUploader,
+        breeds: Iterable[str],
+        path: str,
+        journal: Journal,
+        timeout: float = None,
+) -> JobReport:
+    """Upload an image per sub breed of every breed to `path`, resuming the job recorded in `journal`.
+
+    Breeds resolved before are not resolved again, completed files are skipped and uploads submitted
+    before are waited for by their operations. An operation the disk no longer knows is uploaded again.
+    Failed files are recorded and retried by the next run.
+
+    Raises:
+        TimeoutError: if uploads are not done within `timeout`, they are resumed by the next run.
+    """
+    report = JobReport()
+    uploads: dict[Future, tuple[str, str]] = {}
+    attached: set[Future] = set()
+
+    def submit(url: str, name: str) -> None:
+        try:
+            # Untracked: files recorded as completed must outlive `disk_api.clean_up`.
+            disk_api.makedirs(path, track=False)
+            operation, future = disk_api.submit_upload(path, url, name)
+        except requests.RequestException as e:
+            journal.record_failed(name, url, e)
+            report.failed.append(name)
+            return
+        journal.record_submitted(name, url, operation)
+        uploads[future] = (url, name)
+
+    for breed in breeds:
+        urls = journal.resolved.get(breed)
+        if urls is None:
+            urls = dog_api.get_urls(breed, dog_api.get_sub_breeds(breed))
+            journal.record_resolved(breed, urls)
+        for url in urls:
+            name = file_name_from_url(url)
+            state = journal.files.get(name)
+            if state is not None and state.stage is JournalStage.COMPLETED:
+                report.skipped.append(name)
+                continue
+            if state is not None and state.stage is JournalStage.SUBMITTED and state.operation is not None:
+                future = disk_api.attach_operation(state.operation)
+                uploads[future] = (url, name)
+                attached.add(future)
+                report.reattached.append(name)
+                continue
+            submit(url, name)
+
+    while uploads:
+        done, not_done = wait(uploads, timeout)
+        if not_done:
+            raise TimeoutError(f"{len(not_done)} uploads are still pending")
+        finished, uploads = uploads, {}
+        for future in done:
+            url, name = finished[future]
+            error = future.exception()
+            if future in attached and isinstance(error, requests.HTTPError) \
+                    and error.response is not None and error.response.status_code == 404:
+                # The disk forgot the operation of a previous run, whatever it did is redone.
+                submit(url, name)
+            elif error is not None:
+                journal.record_failed(name, url, error)
+                report.failed.append(name)
+            else:
+                journal.record_completed(name, url)
+                report.completed.append(name)
+    return report
@@ -0,0 +1,190 @@
+"""Streaming breed to disk transfer pipeline."""
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass, field
+from queue import Queue
+from typing import Any, Callable, Iterable
+
+from framework.apis.dog_ceo import DogCeoApi, file_name_from_url
+from framework.apis.yandex_disk import YaUploader
+
+# Marks the end of a stage input.
+_DONE = object()
+
+
+@dataclass(frozen=True)
+class Stage:
+    """Pipeline stage: `func` maps an item to any number of items for the next stage."""
+    name: str
+    func: Callable[[Any], Iterable[Any]]
+    workers: int = 1
+    # Max items waiting for this stage, producers block once it's full.
+    queue_size: int = 64
+
+
+@dataclass
+class StageStats:
+    """Counters of a pipeline stage."""
+    name: str
+    workers: int
+    processed: int = 0
+    failed: int = 0
+    # Items produced for the next stage.
+    emitted: int = 0
+    # Time workers spent on items, including waiting for room downstream.
+    busy_time: float = 0.0
+    queue_depth: int = 0
+    max_queue_depth: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def throughput(self) -> float:
+        """Items processed per second."""
+        return self.processed / self.elapsed if self.elapsed else 0.0
+
+
+@dataclass(frozen=True)
+class StageFailure:
+    """An item a stage failed on."""
+    stage: str
+    item: Any
+    error: Exception
+
+
+@dataclass
+class PipelineReport:
+    """Outcome of a pipeline run."""
+    stages: list[StageStats]
+    failures: list[StageFailure] = field(default_factory=list)
+    elapsed: float = 0.0
+    # Items produced by the last stage.
+    outputs: list[Any] = field(default_factory=list)
+
+
+class Pipeline:
+    """Stages connected by bounded queues, each with its own worker threads.
+
+    Stages overlap, and memory stays flat: at most `queue_size` items wait before each stage.
+    A failed item is recorded and skipped, the rest of the run goes on.
+    """
+
+    def __init__(self, *stages: Stage):
+        self.stages = stages
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self._queues = [Queue(maxsize=stage.queue_size) for stage in self.stages]
+        self._stats = [StageStats(stage.name, stage.workers) for stage in self.stages]
+        self._running = [stage.workers for stage in self.stages]
+        self._failures: list[StageFailure] = []
+        self._outputs: list[Any] = []
+        self._started = time.perf_counter()
+
+    def stats(self) -> list[StageStats]:
+        """Current counters and queue depths, usable while the pipeline runs."""
+        elapsed = time.perf_counter() - self._started
+        with self._lock:
+            for stats, queue in zip(self._stats, self._queues):
+                stats.queue_depth = queue.qsize()
+                stats.elapsed = elapsed
+            return list(self._stats)
+
+    def run(self, items: Iterable[Any]) -> PipelineReport:
+        """Feed `items` to the first stage and wait for all stages to drain."""
+        self._reset()
+        workers = [
+            threading.Thread(target=self._work, args=(index,), name=f"{stage.name}-{worker}", daemon=True)
+            for index, stage in enumerate(self.stages)
+            for worker in range(stage.workers)
+        ]
+        for worker in workers:
+            worker.start()
+        for item in items:
+            self._put(0, item)
+        for _ in range(self.stages[0].workers):
+            self._queues[0].put(_DONE)
+        for worker in workers:
+            worker.join()
+        return PipelineReport(
+            self.stats(),
+            list(self._failures),
+            time.perf_counter() - self._started,
+            list(self._outputs),
+        )
+
+    def _put(self, index: int, item: Any) -> None:
+        queue = self._queues[index]
+        queue.put(item)
+        with self._lock:
+            stats = self._stats[index]
+            stats.max_queue_depth = max(stats.max_queue_depth, queue.qsize())
+
+    def _work(self, index: int) -> None:
+        stage, inbox, stats = self.stages[index], self._queues[index], self._stats[index]
+        has_next = index + 1 < len(self.stages)
+        while (item := inbox.get()) is not _DONE:
+            started = time.perf_counter()
+            emitted = 0
+            try:
+                for result in stage.func(item):
+                    if has_next:
+                        self._put(index + 1, result)
+                    else:
+                        with self._lock:
+                            self._outputs.append(result)
+                    emitted += 1
+            except Exception as e:
+                with self._lock:
+                    stats.failed += 1
+                    self._failures.append(StageFailure(stage.name, item, e))
+            else:
+                with self._lock:
+                    stats.processed += 1
+            with self._lock:
+                stats.emitted += emitted
+                stats.busy_time += time.perf_counter() - started
+        with self._lock:
+            self._running[index] -= 1
+            last = self._running[index] == 0
+        # The last worker out closes the next stage input.
+        if last and has_next:
+            for _ in range(self.stages[index + 1].workers):
+                self._queues[index + 1].put(_DONE)
+
+
+def run_transfer(
+        dog_api: DogCeoApi,
+        disk_api: YaUploader,
+        breeds: Iterable[str],
+        path: str,
+        resolve_workers: int = 4,
+        upload_workers: int = 8,
+        queue_size: int = 64,
+        create_folder: bool = True,
+) -> PipelineReport:
+    """Upload an image per sub breed of every breed to `path`, streaming breeds through the stages:
+
+    resolve (breed -> image urls), name (url -> file name), upload (upload and wait for the operation).
+    `path` is created first unless `create_folder` is off, e.g. when it's created up front by the caller.
+    """
+    def resolve(breed: str) -> tuple[str, ...]:
+        return dog_api.get_urls(breed, dog_api.get_sub_breeds(breed))
+
+    def name(url: str) -> tuple[tuple[str, str]]:
+        return (url, file_name_from_url(url)),
+
+    def upload(file: tuple[str, str]) -> tuple[str]:
+        url, file_name = file
+        disk_api.upload_photos_to_yd(path, url, file_name)
+        return file_name,
+
+    if create_folder:
+        disk_api.create_folder(path)
+    return Pipeline(
+        Stage("resolve", resolve, resolve_workers, queue_size),
+        Stage("name", name, 1, queue_size),
+        Stage("upload", upload, upload_workers, queue_size),
+    ).run(breeds)
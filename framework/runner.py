@@ -0,0 +1,192 @@
+"""Whole-catalog transfer sharded across processes.
+
+Usage: OAUTH_TOKEN=... python -m framework.runner --path PATH [--processes N] [BREED ...]
+"""
+from __future__ import annotations
+
+import argparse
+import multiprocessing
+import os
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Sequence
+
+from framework.apis.dog_ceo import DogCeoApi
+from framework.apis.session import SessionConfig
+from framework.apis.yandex_disk import YaUploader
+from framework.pipeline import run_transfer
+
+
+@dataclass(frozen=True)
+class ShardTask:
+    """Breeds a worker process transfers, with everything it needs to build its own API handlers."""
+    index: int
+    breeds: tuple[str, ...]
+    path: str
+    token: str
+    dog_base_url: str | None = None
+    disk_base_url: str | None = None
+    resolve_workers: int = 4
+    upload_workers: int = 8
+
+
+@dataclass(frozen=True)
+class ShardFailure:
+    """An item a shard failed on, with the error rendered to text to cross process boundaries."""
+    stage: str
+    item: str
+    error: str
+
+
+@dataclass
+class ShardResult:
+    """Outcome of a shard."""
+    index: int
+    breeds: int
+    uploaded: list[str] = field(default_factory=list)
+    failures: list[ShardFailure] = field(default_factory=list)
+    elapsed: float = 0.0
+
+
+@dataclass
+class RunnerReport:
+    """Aggregated outcome of all shards."""
+    shards: list[ShardResult]
+    elapsed: float
+
+    @property
+    def uploaded(self) -> list[str]:
+        return [name for shard in self.shards for name in shard.uploaded]
+
+    @property
+    def failures(self) -> list[ShardFailure]:
+        return [failure for shard in self.shards for failure in shard.failures]
+
+    @property
+    def throughput(self) -> float:
+        """Uploaded files per second."""
+        return len(self.uploaded) / self.elapsed if self.elapsed else 0.0
+
+
+def shard_breeds(breeds: Sequence[str], shards: int) -> list[tuple[str, ...]]:
+    """Split `breeds` round robin into at most `shards` non-empty shards.
+
+    Neighbouring breeds tend to be alike, round robin spreads the heavy ones across shards.
+    """
+    return [tuple(breeds[i::shards]) for i in range(min(shards, len(breeds)))]
+
+
+def run_shard(task: ShardTask) -> ShardResult:
+    """Transfer the breeds of `task` with API handlers of this process."""
+    pool = SessionConfig(pool_connections=2, pool_maxsize=max(task.resolve_workers, task.upload_workers))
+    dog_api = DogCeoApi(pool, base_url=task.dog_base_url, bulk=True)
+    # NOTE: не контекстный менеджер -- папку создал родитель, воркеру удалять нечего.
+    disk_api = YaUploader(task.token, pool, base_url=task.disk_base_url)
+    try:
+        report = run_transfer(
+            dog_api,
+            disk_api,
+            task.breeds,
+            task.path,
+            resolve_workers=task.resolve_workers,
+            upload_workers=task.upload_workers,
+            create_folder=False,
+        )
+    finally:
+        dog_api.close()
+        disk_api.close()
+    return ShardResult(
+        index=task.index,
+        breeds=len(task.breeds),
+        uploaded=list(report.outputs),
+        failures=[
+            ShardFailure(failure.stage, repr(failure.item), f"{type(failure.error).__name__}: {failure.error}")
+            for failure in report.failures
+        ],
+        elapsed=report.elapsed,
+    )
+
+
+def collect_shard(task: ShardTask, future: Future) -> ShardResult:
+    """Result of a shard `future`, a shard whose worker raised or died is recorded as failed as a whole."""
+    try:
+        return future.result()
+    except Exception as e:
+        return ShardResult(
+            index=task.index,
+            breeds=len(task.breeds),
+            failures=[ShardFailure("shard", repr(task.breeds), f"{type(e).__name__}: {e}")],
+        )
+
+
+def run_sharded(
+        token: str,
+        path: str,
+        breeds: Sequence[str] = None,
+        processes: int = None,
+        dog_base_url: str = None,
+        disk_base_url: str = None,
+        resolve_workers: int = 4,
+        upload_workers: int = 8,
+) -> RunnerReport:
+    """Upload an image per sub breed of `breeds`, all breeds by default, to `path` from `processes` processes.
+
+    `path` is created once here before the workers start, so they never race on it.
+    A failed item is recorded in its shard and skipped, like in `run_transfer`.
+    A shard whose worker fails as a whole, e.g. killed by OOM, is recorded with a single `shard` failure,
+    results of the other shards are kept.
+    Every process has its own connection pools and rate limiters, mind the upstream limits choosing `processes`.
+    """
+    started = time.perf_counter()
+    if breeds is None:
+        dog_api = DogCeoApi(base_url=dog_base_url, bulk=True)
+        try:
+            breeds = list(dog_api.catalog)
+        finally:
+            dog_api.close()
+    disk_api = YaUploader(token, base_url=disk_base_url)
+    try:
+        # The folder may be left from a previous run.
+        disk_api.makedirs(path)
+    finally:
+        disk_api.close()
+
+    tasks = [
+        ShardTask(index, shard, path, token, dog_base_url, disk_base_url, resolve_workers, upload_workers)
+        for index, shard in enumerate(shard_breeds(list(breeds), processes or os.cpu_count() or 1))
+    ]
+    # NOTE: spawn, а не fork -- у родителя уже могут крутиться потоки (трекер операций, пулы соединений).
+    with ProcessPoolExecutor(max_workers=len(tasks) or 1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        futures = [pool.submit(run_shard, task) for task in tasks]
+        shards = [collect_shard(task, future) for task, future in zip(tasks, futures)]
+    return RunnerReport(shards, time.perf_counter() - started)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("breeds", nargs="*", help="all breeds by default")
+    parser.add_argument("--path", required=True, help="disk folder to upload to")
+    parser.add_argument("--processes", type=int, default=os.cpu_count())
+    parser.add_argument("--resolve-workers", type=int, default=4)
+    parser.add_argument("--upload-workers", type=int, default=8)
+    args = parser.parse_args()
+
+    report = run_sharded(
+        os.environ["OAUTH_TOKEN"],
+        args.path,
+        args.breeds or None,
+        args.processes,
+        resolve_workers=args.resolve_workers,
+        upload_workers=args.upload_workers,
+    )
+    for shard in report.shards:
+        print(f"shard {shard.index}: {shard.breeds} breeds, {len(shard.uploaded)} uploaded, "
+              f"{len(shard.failures)} failed in {shard.elapsed:.1f}s")
+    for failure in report.failures:
+        print(f"failed at {failure.stage} on {failure.item}: {failure.error}")
+    print(f"total: {len(report.uploaded)} uploaded in {report.elapsed:.1f}s, {report.throughput:.1f} files/s")
+
+
+if __name__ == "__main__":
+    main()
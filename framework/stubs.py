@@ -0,0 +1,430 @@
+"""Local stand-in HTTP servers for offline runs of the APIs."""
+
+import datetime
+import hashlib
+import itertools
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+# Status code, JSON body (raw bytes for files, `None` for no content) and extra headers.
+StubResponse = tuple[int, dict | list | bytes | None, dict[str, str]]
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    """Keep-alive JSON handler dispatching to the owning stub."""
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes, Nagle + delayed ACK would stall keep-alive clients.
+    disable_nagle_algorithm = True
+    server: "_StubHTTPServer"
+
+    def setup(self) -> None:
+        super().setup()
+        stub = self.server.stub
+        # Handlers run in their own threads.
+        with stub._lock:
+            stub.connections += 1
+
+    def _read_body(self) -> bytes:
+        if self.headers.get("Transfer-Encoding", "").lower() != "chunked":
+            return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        chunks = []
+        while size := int(self.rfile.readline().split(b";", 1)[0], 16):
+            chunks.append(self.rfile.read(size))
+            self.rfile.readline()
+        # Trailers end with an empty line.
+        while self.rfile.readline().strip():
+            pass
+        return b"".join(chunks)
+
+    def _dispatch(self) -> None:
+        body = self._read_body()
+        url = urlsplit(self.path)
+        stub = self.server.stub
+        with stub._lock:
+            stub.requests += 1
+        method = "GET" if self.command == "HEAD" else self.command
+        if stub.latency:
+            time.sleep(stub.latency)
+        status, content, headers = (
+                stub.next_fault()
+                or stub.random_fault()
+                or stub.handle(method, url.path, dict(parse_qsl(url.query)), body)
+        )
+        if isinstance(content, bytes):
+            payload, content_type = content, "image/jpeg"
+        else:
+            payload, content_type = b"" if content is None else json.dumps(content).encode(), "application/json"
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        if content is not None:
+            self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(payload)
+
+    do_GET = do_HEAD = do_PUT = do_POST = do_DELETE = _dispatch
+
+    def log_message(self, format, *args) -> None:
+        # NOTE: стандартный хендлер пишет каждый запрос в stderr, в бенчмарках это шум.
+        pass
+
+
+class _StubHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, stub: "StubServer"):
+        super().__init__(("127.0.0.1", 0), _StubHandler)
+        self.stub = stub
+
+
+class StubServer:
+    """Base stub server running in a background thread.
+
+    Every request takes at least `latency` seconds, `error_rate` of requests fail with 500
+    and `throttle_rate` of them with 429 asking to retry after `retry_after` seconds.
+    Usable as a context manager, `url` is available once started.
+    """
+
+    def __init__(
+            self,
+            latency: float = 0.0,
+            error_rate: float = 0.0,
+            throttle_rate: float = 0.0,
+            retry_after: float = 0.1,
+    ):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        # Number of accepted TCP connections and handled requests.
+        self.connections = 0
+        self.requests = 0
+        self._httpd: _StubHTTPServer | None = None
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+        self._faults: list[StubResponse] = []
+
+    @property
+    def url(self) -> str:
+        """Root URL of the running server."""
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StubServer":
+        self._httpd = _StubHTTPServer(self)
+        self._thread = threading.Thread(target=self._httpd.serve_forever, args=(0.05,), daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def inject(self, status: int, count: int = 1, headers: dict[str, str] = None) -> None:
+        """Answer the next `count` requests with `status` instead of handling them."""
+        with self._lock:
+            self._faults.extend([(status, {"error": "Injected"}, headers or {})] * count)
+
+    def next_fault(self) -> StubResponse | None:
+        """Pop the next injected response, if any."""
+        with self._lock:
+            return self._faults.pop(0) if self._faults else None
+
+    def random_fault(self) -> StubResponse | None:
+        """Roll a random 429 or 500 according to `throttle_rate` and `error_rate`."""
+        roll = random.random()
+        if roll < self.throttle_rate:
+            return 429, {"error": "TooManyRequests"}, {"Retry-After": str(self.retry_after)}
+        if roll < self.throttle_rate + self.error_rate:
+            return 500, {"error": "InternalServerError"}, {}
+        return None
+
+    def handle(self, method: str, path: str, query: dict[str, str], body: bytes = b"") -> StubResponse:
+        """Build the response to a request."""
+        return 404, {"status": "error", "message": f"No route for {method} {path}"}, {}
+
+
+class DogCeoStub(StubServer):
+    """Minimal Dog CEO stand-in."""
+
+    def __init__(self, breeds: dict[str, list[str]] = None, image_size: int = 1024, **faults: float):
+        super().__init__(**faults)
+        self.breeds = breeds if breeds is not None else {"doberman": [], "spaniel": ["cocker", "irish"]}
+        # Size of every served image in bytes.
+        self.image_size = image_size
+
+    @property
+    def api_url(self) -> str:
+        """Value for `DogCeoApi(base_url=...)`."""
+        return f"{self.url}/api"
+
+    def handle(self, method: str, path: str, query: dict[str, str], body: bytes = b"") -> StubResponse:
+        parts = path.strip("/").split("/")
+        if method == "GET" and parts[0] == "breeds" and len(parts) == 3:
+            return 200, self.image(path), {}
+        if method == "GET" and parts == ["api", "breeds", "list", "all"]:
+            return 200, {"status": "success", "message": self.breeds}, {}
+        if method != "GET" or parts[:2] != ["api", "breed"] or len(parts) < 4:
+            return super().handle(method, path, query, body)
+        breed, parts = parts[2], parts[3:]
+        if breed not in self.breeds:
+            return 404, {"status": "error", "message": "Breed not found (master breed does not exist)"}, {}
+        if parts == ["list"]:
+            return 200, {"status": "success", "message": self.breeds[breed]}, {}
+        folders = [f"{breed}-{sub_breed}" for sub_breed in self.breeds[breed]] or [breed]
+        if parts[0] in self.breeds[breed]:
+            folders, parts = [f"{breed}-{parts[0]}"], parts[1:]
+        if parts[:2] != ["images", "random"]:
+            return super().handle(method, path, query, body)
+        if len(parts) == 2:
+            return 200, {"status": "success", "message": f"{self.url}/breeds/{folders[0]}/n02107142_1.jpg"}, {}
+        urls = [
+            f"{self.url}/breeds/{folders[i % len(folders)]}/n02107142_{i}.jpg"
+            for i in range(min(int(parts[2]), 50))
+        ]
+        return 200, {"status": "success", "message": urls}, {}
+
+    def image(self, path: str) -> bytes:
+        """Content of the image at `path`, unique per path."""
+        seed = hashlib.sha256(path.encode()).digest()
+        return (seed * (self.image_size // len(seed) + 1))[:self.image_size]
+
+
+def resource_payload(path: str, type_: str) -> dict:
+    """Yandex Disk resource as returned by `/resources`, without `_embedded`."""
+    now = datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds")
+    name = path.rsplit("/", 1)[-1]
+    resource = {
+        "path": f"disk:{path}",
+        "name": name,
+        "revision": str(datetime.datetime.now().timestamp()),
+        "resource_id": f"stub:{path}",
+        "comment_ids": {"private_resource": f"stub:{path}", "public_resource": f"stub:{path}"},
+        "exif": {},
+        "created": now,
+        "modified": now,
+        "type": type_,
+    }
+    if type_ == "file":
+        digest = hashlib.sha256(path.encode())
+        resource |= {
+            "antivirus_status": "clean",
+            "file": f"https://downloader.disk.yandex.ru{path}",
+            "media_type": "image",
+            "md5": hashlib.md5(path.encode()).hexdigest(),
+            "sha256": digest.hexdigest(),
+            "mime_type": "image/jpeg",
+            "size": 1024,
+            "sizes": [],
+        }
+    return resource
+
+
+class YandexDiskStub(StubServer):
+    """Minimal in-memory Yandex Disk stand-in.
+
+    Async operations report `in-progress` for `operation_polls` polls
+    and at least `operation_duration` seconds before succeeding.
+    """
+
+    def __init__(self, operation_polls: int = 0, operation_duration: float = 0.0, **faults: float):
+        super().__init__(**faults)
+        self.operation_polls = operation_polls
+        self.operation_duration = operation_duration
+        # Number of next operations to finish with the `failed` status.
+        self.failing_operations = 0
+        # Disk path (`/a/b`) -> resource payload without `_embedded`.
+        self.resources: dict[str, dict] = {"/": resource_payload("/", "dir")}
+        # Operation id -> polls left before success.
+        self.operations: dict[str, int] = {}
+        # Operation id -> monotonic time of success.
+        self._operations_done_at: dict[str, float] = {}
+        self._ids = itertools.count()
+        self._revisions = itertools.count(1)
+
+    @property
+    def api_url(self) -> str:
+        """Value for `YaUploader(base_url=...)`."""
+        return f"{self.url}/v1/disk"
+
+    @staticmethod
+    def _normalize(path: str) -> str:
+        return "/" + path.removeprefix("disk:").strip("/")
+
+    def _start_operation(self) -> dict:
+        operation_id = str(next(self._ids))
+        self.operations[operation_id] = self.operation_polls
+        self._operations_done_at[operation_id] = time.monotonic() + self.operation_duration
+        if self.failing_operations:
+            self.failing_operations -= 1
+            # Negative polls left mark a failing operation.
+            self.operations[operation_id] = -1
+        return {"href": f"{self.api_url}/operations/{operation_id}", "method": "GET", "templated": False}
+
+    def _touch(self, path: str) -> None:
+        """Bump the revision of a changed `path`, its folders are left as they are."""
+        if path in self.resources:
+            self.resources[path]["revision"] = str(next(self._revisions))
+
+    def _children(self, path: str) -> list[dict]:
+        prefix = path.rstrip("/") + "/"
+        return [
+            resource for child, resource in sorted(self.resources.items())
+            if child.startswith(prefix) and "/" not in child.removeprefix(prefix)
+        ]
+
+    def handle(self, method: str, path: str, query: dict[str, str], body: bytes = b"") -> StubResponse:
+        endpoint = path.removeprefix("/v1/disk")
+        with self._lock:
+            if endpoint.startswith("/operations/") and method == "GET":
+                return self._get_operation(endpoint.rsplit("/", 1)[-1])
+            if endpoint == "/resources":
+                target = self._normalize(query.get("path", "/"))
+                if method == "GET":
+                    return self._get_resource(target, query)
+                if method == "PUT":
+                    return self._create_folder(target)
+                if method == "DELETE":
+                    return self._delete(target)
+            if endpoint == "/resources/upload" and method == "POST":
+                return self._upload(self._normalize(query["path"]))
+            if endpoint == "/resources/upload" and method == "GET":
+                return self._upload_href(self._normalize(query["path"]))
+            if endpoint == "/resources/copy" and method == "POST":
+                return self._copy(
+                    self._normalize(query["from"]),
+                    self._normalize(query["path"]),
+                    query.get("overwrite") == "true",
+                )
+        if path.startswith("/upload-target/") and method == "PUT":
+            return self._receive_upload(path.removeprefix("/upload-target"), body)
+        return super().handle(method, path, query, body)
+
+    def _get_operation(self, operation_id: str) -> StubResponse:
+        if operation_id not in self.operations:
+            return 404, {"error": "NotFound"}, {}
+        if self.operations[operation_id] < 0:
+            return 200, {"status": "failed"}, {}
+        if self.operations[operation_id] > 0:
+            self.operations[operation_id] -= 1
+            return 200, {"status": "in-progress"}, {}
+        if time.monotonic() < self._operations_done_at[operation_id]:
+            return 200, {"status": "in-progress"}, {}
+        return 200, {"status": "success"}, {}
+
+    @staticmethod
+    def _project(value: dict | list, fields: list[list[str]]) -> dict | list:
+        """Keep only dotted `fields` of `value`, lists are projected item by item."""
+        if isinstance(value, list):
+            return [YandexDiskStub._project(item, fields) for item in value]
+        projected = {}
+        for name in dict.fromkeys(field[0] for field in fields):
+            if name not in value:
+                continue
+            nested = [field[1:] for field in fields if field[0] == name]
+            if any(not field for field in nested) or not isinstance(value[name], (dict, list)):
+                projected[name] = value[name]
+            else:
+                projected[name] = YandexDiskStub._project(value[name], nested)
+        return projected
+
+    def _get_resource(self, path: str, query: dict[str, str]) -> StubResponse:
+        status, resource, headers = self._get_full_resource(path, query)
+        if status == 200 and query.get("fields"):
+            resource = self._project(resource, [field.split(".") for field in query["fields"].split(",")])
+        return status, resource, headers
+
+    def _get_full_resource(self, path: str, query: dict[str, str]) -> StubResponse:
+        if path not in self.resources:
+            return 404, {"error": "DiskNotFoundError"}, {}
+        resource = dict(self.resources[path])
+        if resource["type"] == "dir":
+            children = self._children(path)
+            if sort := query.get("sort"):
+                # Stable, ties stay in the order of paths.
+                children.sort(key=lambda child: child.get(sort.lstrip("-")) or "", reverse=sort.startswith("-"))
+            limit, offset = int(query.get("limit", 20)), int(query.get("offset", 0))
+            resource["_embedded"] = {
+                "sort": "",
+                "path": resource["path"],
+                "items": children[offset:offset + limit],
+                "limit": limit,
+                "offset": offset,
+                "total": len(children),
+            }
+        return 200, resource, {}
+
+    def _create_folder(self, path: str) -> StubResponse:
+        if path in self.resources:
+            return 409, {"error": "DiskPathPointsToExistentDirectoryError"}, {}
+        if (path.rsplit("/", 1)[0] or "/") not in self.resources:
+            return 409, {"error": "DiskPathDoesntExistsError"}, {}
+        self.resources[path] = resource_payload(path, "dir")
+        self._touch(path)
+        return 201, {"href": f"{self.api_url}/resources?path=disk:{path}", "method": "GET", "templated": False}, {}
+
+    def _upload_href(self, path: str) -> StubResponse:
+        if (path.rsplit("/", 1)[0] or "/") not in self.resources:
+            return 409, {"error": "DiskPathDoesntExistsError"}, {}
+        return 200, {"href": f"{self.url}/upload-target{path}", "method": "PUT", "templated": False}, {}
+
+    def _receive_upload(self, path: str, body: bytes) -> StubResponse:
+        resource = resource_payload(path, "file") | {
+            "md5": hashlib.md5(body).hexdigest(),
+            "sha256": hashlib.sha256(body).hexdigest(),
+            "size": len(body),
+        }
+        with self._lock:
+            self.resources[path] = resource
+            self._touch(path)
+        return 201, None, {}
+
+    def _upload(self, path: str) -> StubResponse:
+        if (path.rsplit("/", 1)[0] or "/") not in self.resources:
+            return 409, {"error": "DiskPathDoesntExistsError"}, {}
+        self.resources[path] = resource_payload(path, "file")
+        self._touch(path)
+        return 202, self._start_operation(), {}
+
+    def _copy(self, source: str, target: str, overwrite: bool) -> StubResponse:
+        if source not in self.resources:
+            return 404, {"error": "DiskNotFoundError"}, {}
+        if (target.rsplit("/", 1)[0] or "/") not in self.resources:
+            return 409, {"error": "DiskPathDoesntExistsError"}, {}
+        if target in self.resources and not overwrite:
+            return 409, {"error": "DiskResourceAlreadyExistsError"}, {}
+        prefix = source.rstrip("/") + "/"
+        copied = [child for child in self.resources if child == source or child.startswith(prefix)]
+        for child in copied:
+            copy = target + child.removeprefix(source)
+            self.resources[copy] = self.resources[child] | {"path": f"disk:{copy}", "name": copy.rsplit("/", 1)[-1]}
+        self._touch(target)
+        # Like the real disk: folders are copied asynchronously.
+        if len(copied) > 1:
+            return 202, self._start_operation(), {}
+        return 201, {"href": f"{self.api_url}/resources?path=disk:{target}", "method": "GET", "templated": False}, {}
+
+    def _delete(self, path: str) -> StubResponse:
+        if path not in self.resources:
+            return 404, {"error": "DiskNotFoundError"}, {}
+        prefix = path.rstrip("/") + "/"
+        removed = [child for child in self.resources if child == path or child.startswith(prefix)]
+        for child in removed:
+            del self.resources[child]
+        # Like the real disk: non-empty folders are deleted asynchronously.
+        if len(removed) > 1:
+            return 202, self._start_operation(), {}
+        return 204, None, {}
@@ -0,0 +1,142 @@
+"""Idempotent, skip-if-present sync of images to a disk folder."""
+from __future__ import annotations
+
+import json
+import os
+from dataclasses import asdict, dataclass, field
+from typing import Iterable
+
+import requests
+
+from framework.apis.yandex_disk import ResourceType, YaUploader
+
+# Item fields needed to index a folder.
+INDEX_FIELDS = ("name", "type", "md5", "sha256", "size")
+
+
+@dataclass(frozen=True)
+class RemoteFile:
+    """A file known to exist on the disk."""
+    name: str
+    md5: str | None = None
+    sha256: str | None = None
+    size: int | None = None
+
+
+class FolderIndex:
+    """Files of a disk folder keyed by name, with their hashes to spot changed content."""
+
+    def __init__(self, files: Iterable[RemoteFile] = ()):
+        self.by_name: dict[str, RemoteFile] = {}
+        for file in files:
+            self.add(file)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.by_name
+
+    def __len__(self) -> int:
+        return len(self.by_name)
+
+    def add(self, file: RemoteFile) -> None:
+        self.by_name[file.name] = file
+
+    @classmethod
+    def from_disk(cls, disk_api: YaUploader, path: str, page_size: int = 1000) -> FolderIndex | None:
+        """Index `path` with a single projected listing, `None` if the folder does not exist."""
+        try:
+            return cls(
+                RemoteFile(item.name, item.md5, item.sha256, item.size)
+                for item in disk_api.iter_folder(path, page_size=page_size, fields=INDEX_FIELDS)
+                if item.type is ResourceType.FILE
+            )
+        except requests.HTTPError as e:
+            if e.response is not None and e.response.status_code == 404:
+                return None
+            raise
+
+
+@dataclass
+class ManifestEntry:
+    """What was uploaded as a file during previous runs."""
+    url: str
+    md5: str | None = None
+    sha256: str | None = None
+    size: int | None = None
+
+
+class SyncManifest:
+    """File name -> `ManifestEntry` persisted as JSON between runs."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: dict[str, ManifestEntry] = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.entries = {name: ManifestEntry(**entry) for name, entry in json.load(f).items()}
+
+    def save(self) -> None:
+        """Atomically write the manifest."""
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({name: asdict(entry) for name, entry in self.entries.items()}, f)
+        os.replace(tmp_path, self.path)
+
+
+@dataclass
+class SyncPlan:
+    """Files to upload and names already present and unchanged."""
+    upload: list[tuple[str, str]] = field(default_factory=list)
+    skipped: list[str] = field(default_factory=list)
+
+
+def plan_sync(index: FolderIndex, files: Iterable[tuple[str, str]], manifest: SyncManifest = None) -> SyncPlan:
+    """Split `(url, name)` pairs into missing or changed files and present ones.
+
+    A present file counts as changed if the manifest recorded it from another url
+    or with other content than the disk has now.
+    """
+    plan = SyncPlan()
+    for url, name in files:
+        remote = index.by_name.get(name)
+        entry = manifest.entries.get(name) if manifest is not None else None
+        if remote is None:
+            plan.upload.append((url, name))
+        elif entry is not None and (
+                entry.url != url
+                or (entry.md5 and remote.md5 and entry.md5 != remote.md5)
+                or (entry.sha256 and remote.sha256 and entry.sha256 != remote.sha256)
+        ):
+            plan.upload.append((url, name))
+        else:
+            plan.skipped.append(name)
+    return plan
+
+
+def sync_photos(
+        disk_api: YaUploader,
+        path: str,
+        files: Iterable[tuple[str, str]],
+        manifest_path: str = None,
+) -> SyncPlan:
+    """Upload only missing or changed `(url, name)` pairs to `path`.
+
+    Costs one listing when everything is in place. With `manifest_path` the uploaded files
+    are recorded with their disk hashes, which takes one more listing after uploading.
+    A missing `path` is created untracked, so that `disk_api.clean_up` leaves the synced files for the next sync.
+    Returns what was uploaded and skipped.
+    """
+    manifest = SyncManifest(manifest_path) if manifest_path is not None else None
+    index = FolderIndex.from_disk(disk_api, path)
+    if index is None:
+        disk_api.makedirs(path, track=False)
+        index = FolderIndex()
+    plan = plan_sync(index, files, manifest)
+    if plan.upload:
+        disk_api.upload_many(path, plan.upload)
+    if manifest is not None and plan.upload:
+        index = FolderIndex.from_disk(disk_api, path) or FolderIndex()
+        for url, name in plan.upload:
+            remote = index.by_name.get(name, RemoteFile(name))
+            manifest.entries[name] = ManifestEntry(url, remote.md5, remote.sha256, remote.size)
+        manifest.save()
+    return plan
@@ -0,0 +1,694 @@
+"""Offline tests of `framework.apis` against local stub servers."""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import requests
+
+from framework.apis.aio import AsyncDogCeoApi, AsyncYaUploader, transfer_breeds
+from framework.apis.cache import MemoryCache, SQLiteCache
+from framework.apis import decoding
+from framework.apis.concurrency import AIMDLimiter
+from framework.apis.dog_ceo import DogCeoApi, RandomImageMode
+from framework.apis.metrics import JsonLinesSink, MemorySink, Metrics, PrometheusTextSink
+from framework.apis.operations import OperationFailedError, OperationTracker, PollBackoff, wait_all
+from framework.apis.policy import RateLimiter, RetryPolicy, RetryReason
+from framework.apis.session import SessionConfig
+from framework.apis.yandex_disk import (
+    CompactFolder,
+    CompactFolderItem,
+    Folder,
+    FolderCache,
+    FolderItem,
+    FolderWatcher,
+    ResourceType,
+    UploadMode,
+    YaUploader,
+    _outermost_paths,
+)
+from framework.stubs import DogCeoStub, YandexDiskStub, resource_payload
+
+
+def test_session_is_pooled(dog_stub, dog_api):
+    for _ in range(5):
+        dog_api._send_request(dog_api.session.get, "/breed/spaniel/list")
+    assert dog_stub.connections == 1
+
+
+def test_session_config():
+    config = SessionConfig(pool_maxsize=3, connect_timeout=1, read_timeout=2)
+    api = DogCeoApi(config)
+    adapter = api.session.get_adapter("https://dog.ceo")
+    assert adapter._pool_maxsize == 3
+    assert config.timeout == (1, 2)
+
+
+def test_sub_breeds_and_urls(dog_api):
+    sub_breeds = dog_api.get_sub_breeds("spaniel")
+    assert sub_breeds == ("cocker", "irish")
+    urls = dog_api.get_urls("spaniel", sub_breeds)
+    assert [url.split("/")[-2] for url in urls] == ["spaniel-cocker", "spaniel-irish"]
+    assert len(dog_api.get_urls("doberman", ())) == 1
+
+
+def test_unknown_breed_raises(dog_api):
+    with pytest.raises(requests.HTTPError):
+        dog_api.get_sub_breeds("unknown")
+
+
+def test_upload_and_clean_up(disk_stub):
+    with YaUploader(token="test", base_url=disk_stub.api_url) as disk_api:
+        disk_api.create_folder("test_folder")
+        disk_api.upload_photos_to_yd("test_folder", "https://dog.ceo/x/doberman/1.jpg", "doberman_1.jpg")
+        folder = disk_api.get_folder("/test_folder")
+        assert folder.type == ResourceType.DIR
+        assert [item.name for item in folder.embedded.items] == ["doberman_1.jpg"]
+    assert "/test_folder" not in disk_stub.resources
+
+
+def test_async_transfer_breeds(dog_stub, disk_stub):
+    async def transfer() -> dict[str, tuple[str, ...]]:
+        async with AsyncDogCeoApi(DogCeoApi(base_url=dog_stub.api_url)) as dog_api, \
+                AsyncYaUploader(api=YaUploader("test", base_url=disk_stub.api_url)) as disk_api:
+            names = await transfer_breeds(dog_api, disk_api, ["doberman", "spaniel"], "test_folder")
+            folder = await disk_api.get_folder("/test_folder")
+            assert len(folder.embedded.items) == 3
+            return names
+
+    names = asyncio.run(transfer())
+    assert names["spaniel"] == ("spaniel-cocker_n02107142_1.jpg", "spaniel-irish_n02107142_1.jpg")
+    assert "/test_folder" not in disk_stub.resources
+
+
+def test_operation_tracker_resolves_batch():
+    polls: dict[str, int] = {}
+
+    def poll_status(endpoint: str) -> str:
+        polls[endpoint] = polls.get(endpoint, 0) + 1
+        if endpoint == "/operations/bad":
+            return "failed"
+        return "success" if polls[endpoint] >= 3 else "in-progress"
+
+    tracker = OperationTracker(poll_status, PollBackoff(initial=0.01, max_delay=0.02))
+    done = []
+    futures = [tracker.submit(f"/operations/{i}", callback=done.append) for i in range(50)]
+    wait_all(futures, timeout=5)
+    assert len(done) == 50
+    with pytest.raises(OperationFailedError):
+        tracker.submit("/operations/bad").result(timeout=5)
+    assert tracker.pending == 0
+    tracker.close()
+
+
+def test_operation_tracker_timeout():
+    tracker = OperationTracker(lambda endpoint: "in-progress", PollBackoff(initial=0.01, timeout=0.05))
+    with pytest.raises(TimeoutError):
+        tracker.submit("/operations/slow").result(timeout=5)
+    tracker.close()
+
+
+def test_upload_many_waits_once(disk_stub):
+    disk_stub.operation_polls = 2
+    backoff = PollBackoff(initial=0.01, max_delay=0.02)
+    with YaUploader(token="test", base_url=disk_stub.api_url, poll_backoff=backoff) as disk_api:
+        disk_api.create_folder("test_folder")
+        disk_api.upload_many("test_folder", ((f"https://dog.ceo/x/pug/{i}.jpg", f"pug_{i}.jpg") for i in range(20)))
+        assert len(disk_stub._children("/test_folder")) == 20
+        assert disk_api.operations.pending == 0
+    assert "/test_folder" not in disk_stub.resources
+
+
+def test_retry_after_is_honored(dog_stub):
+    api = DogCeoApi(base_url=dog_stub.api_url, retry_policy=RetryPolicy(base_delay=0.01))
+    dog_stub.inject(429, headers={"Retry-After": "0.2"})
+    dog_stub.inject(503)
+    assert api.get_sub_breeds("spaniel") == ("cocker", "irish")
+    assert api.stats.retries == {RetryReason.THROTTLED: 1, RetryReason.SERVER_ERROR: 1}
+    assert api.stats.backoff_time >= 0.2
+    api.close()
+
+
+def test_retries_run_out(dog_stub):
+    api = DogCeoApi(base_url=dog_stub.api_url, retry_policy=RetryPolicy(max_attempts=2, base_delay=0.01))
+    dog_stub.inject(500, count=2)
+    with pytest.raises(requests.HTTPError):
+        api.get_sub_breeds("spaniel")
+    assert api.stats.retries == {RetryReason.SERVER_ERROR: 1}
+    api.close()
+
+
+def test_retry_after_is_capped():
+    throttled = requests.Response()
+    throttled.status_code = 429
+    throttled.headers["Retry-After"] = "3600"
+    policy = RetryPolicy(max_delay=1.0)
+    assert policy.delay(1, requests.HTTPError(response=throttled)) == 1.0
+    throttled.headers["Retry-After"] = "Wed, 21 Oct 2099 07:28:00 GMT"
+    assert policy.delay(1, requests.HTTPError(response=throttled)) == 1.0
+
+
+def test_rate_limiter_throttles_per_host():
+    limiter = RateLimiter(rates={"dog.ceo": 20}, burst=1)
+    assert sum(limiter.acquire("https://dog.ceo/api") for _ in range(5)) >= 0.15
+    assert limiter.acquire("https://cloud-api.yandex.net/v1/disk") == 0
+
+
+def test_failed_uploads_are_resubmitted(disk_stub):
+    disk_stub.failing_operations = 2
+    metrics = Metrics()
+    with YaUploader(
+            token="test",
+            base_url=disk_stub.api_url,
+            poll_backoff=PollBackoff(initial=0.01),
+            retry_policy=RetryPolicy(base_delay=0.01),
+            metrics=metrics,
+    ) as disk_api:
+        disk_api.create_folder("test_folder")
+        disk_api.upload_many("test_folder", ((f"https://dog.ceo/x/pug/{i}.jpg", f"pug_{i}.jpg") for i in range(5)))
+        disk_api.upload_photos_to_yd("test_folder", "https://dog.ceo/x/pug/5.jpg", "pug_5.jpg")
+        assert disk_api.stats.retries == {RetryReason.OPERATION_FAILED: 2}
+    labels = (("api", "YaUploader"), ("endpoint", "/resources/upload"), ("reason", "OPERATION_FAILED"))
+    assert metrics.counters["api_retries_total"][labels] == 2
+
+
+def test_stream_retries_are_recorded(dog_stub, disk_stub):
+    metrics = Metrics()
+    url = f"{dog_stub.url}/breeds/pug/1.jpg"
+    with YaUploader(
+            token="test",
+            base_url=disk_stub.api_url,
+            retry_policy=RetryPolicy(base_delay=0.01),
+            upload_mode=UploadMode.STREAM,
+            metrics=metrics,
+    ) as disk_api:
+        disk_api.create_folder("test_folder")
+        dog_stub.inject(503)
+        disk_api.upload_photos_to_yd("test_folder", url, "pug_1.jpg")
+    labels = (("api", "YaUploader"), ("endpoint", "{source}"), ("reason", "SERVER_ERROR"))
+    assert metrics.counters["api_retries_total"][labels] == 1
+    summary = metrics.summary()
+    assert summary["YaUploader GET {source}"]["count"] == 2
+    assert summary["YaUploader PUT {upload_href}"]["count"] == 1
+
+
+def test_failed_upload_requests_are_not_retried_twice(disk_stub):
+    with YaUploader(
+            token="test",
+            base_url=disk_stub.api_url,
+            retry_policy=RetryPolicy(max_attempts=3, base_delay=0.01),
+    ) as disk_api:
+        disk_api.create_folder("test_folder")
+        requests_before = disk_stub.requests
+        disk_stub.inject(500, count=3)
+        with pytest.raises(requests.HTTPError):
+            disk_api.upload_photos_to_yd("test_folder", "https://dog.ceo/x/pug/1.jpg", "pug_1.jpg")
+        assert disk_stub.requests - requests_before == 3
+        assert disk_api.stats.retries == {RetryReason.SERVER_ERROR: 2}
+
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_cache_ttl_and_eviction(backend, tmp_path):
+    cache = MemoryCache(max_entries=2) if backend == "memory" else SQLiteCache(str(tmp_path / "c.db"), max_entries=2)
+    cache.set("a", [1])
+    cache.set("b", [2], ttl=-1)
+    assert cache.get("a") == [1]
+    assert cache.get("b") is None
+    cache.set("c", [3])
+    cache.set("d", [4])
+    assert cache.get("a") is None
+    assert cache.stats.hits == 1
+    assert cache.stats.expirations == 1
+    assert cache.stats.evictions == 1
+    cache.close()
+
+
+def test_sub_breeds_survive_restart(dog_stub, tmp_path):
+    path = str(tmp_path / "dogs.db")
+    api = DogCeoApi(base_url=dog_stub.api_url, cache=SQLiteCache(path))
+    api.get_sub_breeds("spaniel")
+    api.close()
+    api = DogCeoApi(base_url=dog_stub.api_url, cache=SQLiteCache(path))
+    assert api.get_sub_breeds("spaniel") == ("cocker", "irish")
+    assert api.cache.stats.hits == 1
+    assert dog_stub.connections == 1
+    api.close()
+
+
+def test_random_image_mode(dog_api):
+    dog_api.get_url("doberman")
+    dog_api.get_url("doberman")
+    assert dog_api.cache.stats.hits == 0
+    dog_api.random_images = RandomImageMode.CACHED
+    dog_api.get_url("doberman")
+    dog_api.get_url("doberman")
+    assert dog_api.cache.stats.hits == 1
+
+
+def test_bulk_mode(dog_stub):
+    dog_stub.breeds["hound"] = [f"sub{i}" for i in range(60)]
+    api = DogCeoApi(base_url=dog_stub.api_url, bulk=True)
+    assert api.get_sub_breeds("spaniel") == ("cocker", "irish")
+    assert api.get_sub_breeds("doberman") == ()
+    urls = api.get_catalog_urls()
+    assert [url.split("/")[-2] for url in urls["spaniel"]] == ["spaniel-cocker", "spaniel-irish"]
+    assert [url.split("/")[-2] for url in urls["hound"]] == [f"hound-sub{i}" for i in range(60)]
+    # The catalog, a batch per breed and 10 hound sub breeds missing from its batch of 50.
+    assert dog_stub.requests == 1 + 3 + 10
+    api.close()
+
+
+@pytest.mark.parametrize("mode, image_size, streamed", [
+    (UploadMode.STREAM, 1024, True),
+    (UploadMode.AUTO, 3 * 1024 * 1024, True),
+    (UploadMode.AUTO, 1024, False),
+])
+def test_upload_modes(dog_stub, disk_stub, mode, image_size, streamed):
+    dog_stub.image_size = image_size
+    url = dog_stub.api_url.removesuffix("/api") + "/breeds/pug/1.jpg"
+    with YaUploader(token="test", base_url=disk_stub.api_url, upload_mode=mode) as disk_api:
+        disk_api.create_folder("test_folder")
+        disk_api.upload_photos_to_yd("test_folder", url, "pug_1.jpg")
+        uploaded = disk_stub.resources["/test_folder/pug_1.jpg"]
+        assert (uploaded["md5"] == hashlib.md5(dog_stub.image("/breeds/pug/1.jpg")).hexdigest()) is streamed
+        assert not disk_stub.operations if streamed else disk_stub.operations
+
+
+@pytest.mark.parametrize("mode", [UploadMode.STREAM, UploadMode.AUTO])
+def test_stream_uploads_run_concurrently(disk_stub, mode):
+    in_flight = max_in_flight = 0
+    lock = threading.Lock()
+
+    class CountingStub(DogCeoStub):
+        def image(self, path: str) -> bytes:
+            nonlocal in_flight, max_in_flight
+            with lock:
+                in_flight += 1
+                max_in_flight = max(max_in_flight, in_flight)
+            time.sleep(0.1)
+            with lock:
+                in_flight -= 1
+            return super().image(path)
+
+    with CountingStub(image_size=3 * 1024 * 1024) as dog_stub, \
+            YaUploader(token="test", base_url=disk_stub.api_url, upload_mode=mode) as disk_api:
+        disk_api.create_folder("test_folder")
+        disk_api.upload_many("test_folder", [(f"{dog_stub.url}/breeds/pug/{i}.jpg", f"pug_{i}.jpg") for i in range(8)])
+        assert len(disk_stub._children("/test_folder")) == 8
+        assert not disk_stub.operations
+    # Sources are fetched one after another without the transfers pool.
+    assert max_in_flight > 1
+
+
+def test_source_refusing_head_is_streamed(dog_stub, disk_stub):
+    metrics = Metrics()
+    url = f"{dog_stub.url}/breeds/pug/1.jpg"
+    with YaUploader(token="test", base_url=disk_stub.api_url, upload_mode=UploadMode.AUTO, metrics=metrics) as disk_api:
+        disk_api.create_folder("test_folder")
+        dog_stub.inject(405)
+        disk_api.upload_photos_to_yd("test_folder", url, "pug_1.jpg")
+        content = dog_stub.image("/breeds/pug/1.jpg")
+        assert disk_stub.resources["/test_folder/pug_1.jpg"]["md5"] == hashlib.md5(content).hexdigest()
+    assert metrics.summary()["YaUploader HEAD {source}"]["count"] == 1
+
+
+@pytest.mark.parametrize("prefetch", [True, False])
+def test_iter_folder_pages(disk_stub, yandex_disk_api, prefetch):
+    yandex_disk_api.create_folder("test_folder")
+    yandex_disk_api.upload_many("test_folder", ((f"https://dog.ceo/x/pug/{i}.jpg", f"pug_{i:02}.jpg") for i in range(25)))
+    requests_before = disk_stub.requests
+    items = yandex_disk_api.iter_folder("/test_folder", page_size=10, prefetch=prefetch)
+    assert next(items).name == "pug_00.jpg"
+    assert len(list(items)) == 24
+    assert disk_stub.requests - requests_before == 3
+    projected = list(yandex_disk_api.iter_folder("/test_folder", page_size=25, fields=("name", "md5")))
+    assert isinstance(projected[0], CompactFolderItem)
+    assert (projected[0].name, projected[0].size) == ("pug_00.jpg", None)
+    assert len(projected) == 25
+
+
+def test_compact_models_match_dataclasses(disk_stub, yandex_disk_api):
+    yandex_disk_api.create_folder("test_folder")
+    yandex_disk_api.upload_photos_to_yd("test_folder", "https://dog.ceo/x/pug/1.jpg", "pug_1.jpg")
+    folder = yandex_disk_api.get_folder("/test_folder")
+    compact = yandex_disk_api.get_folder("/test_folder", compact=True)
+    assert not hasattr(compact, "__dict__")
+    for name in ("name", "path", "type", "created", "modified"):
+        assert getattr(compact, name) == getattr(folder, name)
+    item, compact_item = folder.embedded.items[0], compact.embedded.items[0]
+    assert not hasattr(compact_item, "__dict__")
+    for name in FolderItem.__dataclass_fields__:
+        assert getattr(compact_item, name) == getattr(item, name)
+
+
+def test_clean_up_merges_nested_paths(disk_stub, yandex_disk_api):
+    for path in ("a", "a/b", "a/b/c", "/d", "e"):
+        yandex_disk_api.create_folder(path)
+    yandex_disk_api.upload_photos_to_yd("a/b", "https://dog.ceo/x/pug/1.jpg", "pug_1.jpg")
+    requests_before = disk_stub.requests
+    yandex_disk_api.clean_up()
+    # DELETE of /a, /d and /e plus a poll of the operation deleting non-empty /a.
+    assert disk_stub.requests - requests_before == 4
+    assert list(disk_stub.resources) == ["/"]
+    yandex_disk_api.clean_up()
+    assert disk_stub.requests - requests_before == 4
+    assert _outermost_paths(["/d", "disk:/d/", "d/e", "de"]) == ["/d", "/de"]
+
+
+def test_background_clean_up(disk_stub):
+    disk_api = YaUploader(token="test", base_url=disk_stub.api_url, background_clean_up=True)
+    with disk_api:
+        disk_api.create_folder("a")
+        disk_api.create_folder("a/b")
+    for _ in range(100):
+        if disk_api.operations._closed:
+            break
+        time.sleep(0.01)
+    assert list(disk_stub.resources) == ["/"]
+    assert disk_api.operations._closed
+
+
+SLOW_DELETE_EXIT = """
+import threading
+import time
+
+from framework.apis.yandex_disk import YaUploader
+from framework.stubs import YandexDiskStub
+
+deleting = threading.Event()
+
+
+class SlowDeleteStub(YandexDiskStub):
+    def _delete(self, path):
+        deleting.set()
+        time.sleep(5)
+        return super()._delete(path)
+
+
+stub = SlowDeleteStub().start()
+with YaUploader(token="test", base_url=stub.api_url, background_clean_up=True) as disk_api:
+    disk_api.create_folder("a")
+    disk_api.create_folder("b")
+assert deleting.wait(5)
+"""
+
+
+def test_background_clean_up_does_not_block_exit():
+    started = time.monotonic()
+    subprocess.run([sys.executable, "-c", SLOW_DELETE_EXIT], check=True, timeout=30, cwd=os.path.dirname(__file__))
+    assert time.monotonic() - started < 3
+
+
+def test_request_metrics(dog_stub, tmp_path):
+    memory = MemorySink()
+    json_lines = JsonLinesSink(str(tmp_path / "events.jsonl"))
+    prometheus = PrometheusTextSink(str(tmp_path / "metrics.prom"))
+    metrics = Metrics([memory, json_lines, prometheus])
+    dog_stub.inject(503)
+    dog_api = DogCeoApi(base_url=dog_stub.api_url, retry_policy=RetryPolicy(base_delay=0.01), metrics=metrics)
+    dog_api.get_urls("spaniel", dog_api.get_sub_breeds("spaniel"))
+    dog_api.get_random_urls("spaniel", count=3)
+    metrics.flush()
+    json_lines.close()
+    dog_api.close()
+
+    summary = metrics.summary()
+    assert summary["DogCeoApi GET /breed/{breed}/list"]["count"] == 2
+    assert summary["DogCeoApi GET /breed/{breed}/{sub_breed}/images/random"]["count"] == 2
+    assert summary["DogCeoApi GET /breed/{breed}/images/random/{n}"]["count"] == 1
+    assert len(memory.events) == 6
+    with open(tmp_path / "events.jsonl", encoding="utf-8") as f:
+        assert [json.loads(line)["kind"] for line in f] == [event["kind"] for event in memory.events]
+    text = (tmp_path / "metrics.prom").read_text(encoding="utf-8")
+    assert 'api_responses_total{api="DogCeoApi",method="GET",endpoint="/breed/{breed}/list",status="503"} 1' in text
+    assert 'api_retries_total{api="DogCeoApi",endpoint="/breed/{breed}/list",reason="SERVER_ERROR"} 1' in text
+    assert 'api_request_duration_seconds_bucket{api="DogCeoApi",method="GET",endpoint="/breed/{breed}/list",le="+Inf"} 2' \
+        in text
+
+
+def test_operation_metrics(disk_stub):
+    disk_stub.operation_polls = 2
+    metrics = Metrics()
+    backoff = PollBackoff(initial=0.01, max_delay=0.02)
+    with YaUploader(token="test", base_url=disk_stub.api_url, poll_backoff=backoff, metrics=metrics) as disk_api:
+        disk_api.create_folder("test_folder")
+        disk_api.upload_many("test_folder", ((f"https://dog.ceo/x/pug/{i}.jpg", f"pug_{i}.jpg") for i in range(3)))
+        assert metrics.counters["operation_polls_total"] == {
+            (("status", "in-progress"),): 6,
+            (("status", "success"),): 3,
+        }
+        assert metrics.operation_wait[(("outcome", "success"),)].count == 3
+        assert metrics.summary()["YaUploader GET /operations/{id}"]["count"] == 9
+
+
+def test_stub_faults_and_latency():
+    with DogCeoStub(latency=0.05, throttle_rate=1.0, retry_after=2) as stub:
+        started = time.perf_counter()
+        res = requests.get(f"{stub.api_url}/breed/spaniel/list")
+        assert time.perf_counter() - started >= 0.05
+        assert res.status_code == 429
+        assert res.headers["Retry-After"] == "2"
+        stub.throttle_rate, stub.error_rate = 0.0, 1.0
+        assert requests.get(f"{stub.api_url}/breed/spaniel/list").status_code == 500
+
+
+def test_stub_operation_duration():
+    with YandexDiskStub(operation_duration=0.2) as stub, \
+            YaUploader(token="test", base_url=stub.api_url, poll_backoff=PollBackoff(initial=0.01)) as disk_api:
+        started = time.perf_counter()
+        disk_api.create_folder("test_folder")
+        disk_api.upload_photos_to_yd("test_folder", "https://dog.ceo/x/pug/1.jpg", "pug_1.jpg")
+        assert time.perf_counter() - started >= 0.2
+
+
+def test_makedirs(disk_stub):
+    disk_stub.resources["/dogs"] = resource_payload("/dogs", "dir")
+    folder_cache = FolderCache()
+    with YaUploader(token="test", base_url=disk_stub.api_url, folder_cache=folder_cache) as disk_api:
+        requests_before = disk_stub.requests
+        disk_api.makedirs("dogs/spaniel/cocker", "dogs/spaniel/irish", "dogs/doberman", "/dogs/")
+        # 409 for the existing /dogs plus a request per new folder.
+        assert disk_stub.requests - requests_before == 1 + 4
+        assert {"/dogs/spaniel/cocker", "/dogs/spaniel/irish", "/dogs/doberman"} <= set(disk_stub.resources)
+        other_api = YaUploader(token="test", base_url=disk_stub.api_url, folder_cache=folder_cache)
+        other_api.makedirs("dogs/spaniel/cocker")
+        other_api.create_folder("dogs/doberman")
+        other_api.close()
+        assert disk_stub.requests - requests_before == 1 + 4
+    # The pre-existing folder is left alone by the clean up.
+    assert list(disk_stub.resources) == ["/", "/dogs"]
+    assert "/dogs/spaniel" not in folder_cache
+
+
+@pytest.mark.parametrize("fast", [True, False])
+def test_folder_decoding(disk_stub, yandex_disk_api, monkeypatch, fast):
+    if not fast:
+        monkeypatch.setattr(decoding, "orjson", None)
+    yandex_disk_api.create_folder("test_folder")
+    yandex_disk_api.upload_photos_to_yd("test_folder", "https://dog.ceo/x/pug/1.jpg", "pug_1.jpg")
+    res = yandex_disk_api._send_request(yandex_disk_api.session.get, "/resources", params={"path": "/test_folder"})
+    payload = decoding.response_json(res)
+    assert payload == res.json()
+    folder = Folder.build_from_response(payload)
+    # The payload is left intact for other models.
+    assert payload == res.json()
+    assert folder.embedded.items[0].name == CompactFolder.build_from_response(payload).embedded.items[0].name
+
+
+def test_concurrent_lookups_are_coalesced():
+    with DogCeoStub(latency=0.1) as stub:
+        dog_api = DogCeoApi(base_url=stub.api_url)
+        with ThreadPoolExecutor(8) as pool:
+            results = list(pool.map(lambda _: dog_api.get_sub_breeds("spaniel"), range(8)))
+        dog_api.close()
+    assert results == [("cocker", "irish")] * 8
+    assert stub.requests == 1
+
+
+def test_fetch_counts_one_miss(dog_api):
+    dog_api.get_sub_breeds("spaniel")
+    dog_api.get_sub_breeds("spaniel")
+    assert (dog_api.cache.stats.misses, dog_api.cache.stats.hits) == (1, 1)
+
+
+@pytest.mark.parametrize("bulk", [False, True])
+def test_pinned_urls_are_replayed(dog_stub, tmp_path, bulk):
+    def resolve() -> tuple[str, ...]:
+        dog_api = DogCeoApi(
+            base_url=dog_stub.api_url,
+            cache=SQLiteCache(str(tmp_path / "cache.sqlite")),
+            random_images=RandomImageMode.PINNED,
+            bulk=bulk,
+        )
+        urls = dog_api.get_urls("spaniel", dog_api.get_sub_breeds("spaniel")) + dog_api.get_urls("doberman", ())
+        dog_api.close()
+        return urls
+
+    urls = resolve()
+    requests_before = dog_stub.requests
+    assert resolve() == urls
+    assert dog_stub.requests == requests_before
+
+
+def test_aimd_limiter():
+    metrics = Metrics()
+    limiter = AIMDLimiter(initial=2, max_limit=4, cooldown=60, name="test", metrics=metrics)
+    for _ in range(2):
+        with limiter.slot():
+            pass
+    # +1/2, then +1/2.5.
+    assert limiter.limit == 2
+    for _ in range(10):
+        with limiter.slot():
+            pass
+    assert limiter.limit == 4
+    throttled = requests.Response()
+    throttled.status_code = 429
+    for _ in range(2):
+        limiter.release(limiter.acquire(), requests.HTTPError(response=throttled))
+    # Cut once per cooldown.
+    assert limiter.limit == 2
+    limiter.release(limiter.acquire(), ValueError())
+    assert limiter.limit == 2
+    assert metrics.gauges["concurrency_limit"][(("limiter", "test"),)] == 2
+
+
+def test_limiter_publishes_to_handler_metrics(dog_stub, disk_stub):
+    dog_api = DogCeoApi(base_url=dog_stub.api_url, concurrency=AIMDLimiter(initial=3, name="dog"))
+    disk_api = YaUploader(
+        token="test",
+        base_url=disk_stub.api_url,
+        metrics=dog_api.metrics,
+        upload_concurrency=AIMDLimiter(initial=5, name="upload"),
+    )
+    assert dog_api.metrics.gauges["concurrency_limit"] == {(("limiter", "dog"),): 3, (("limiter", "upload"),): 5}
+    # A limiter keeps publishing to the metrics it was built with.
+    own = Metrics()
+    DogCeoApi(base_url=dog_stub.api_url, concurrency=AIMDLimiter(name="own", metrics=own))
+    assert (("limiter", "own"),) not in dog_api.metrics.gauges["concurrency_limit"]
+    assert own.gauges["concurrency_limit"] == {(("limiter", "own"),): 4}
+    dog_api.close()
+    disk_api.close()
+
+
+def test_upload_concurrency_backs_off_on_failed_operations(disk_stub):
+    disk_stub.operation_polls = 1
+    disk_stub.failing_operations = 4
+    limiter = AIMDLimiter(initial=8, cooldown=0)
+    with YaUploader(
+            token="test",
+            base_url=disk_stub.api_url,
+            poll_backoff=PollBackoff(initial=0.01, max_delay=0.02),
+            retry_policy=RetryPolicy(base_delay=0.01),
+            upload_concurrency=limiter,
+    ) as disk_api:
+        disk_api.create_folder("test_folder")
+        disk_api.upload_many("test_folder", ((f"https://dog.ceo/x/pug/{i}.jpg", f"pug_{i}.jpg") for i in range(8)))
+        assert len(disk_stub._children("/test_folder")) == 8
+    assert limiter.limit < 8
+    assert limiter.in_flight == 0
+
+
+def test_async_uploads_are_adaptively_limited(disk_stub):
+    disk_stub.operation_polls = 1
+    disk_stub.failing_operations = 4
+    limiter = AIMDLimiter(initial=8, cooldown=0)
+
+    async def upload() -> None:
+        api = YaUploader(
+            token="test",
+            base_url=disk_stub.api_url,
+            poll_backoff=PollBackoff(initial=0.01, max_delay=0.02),
+            retry_policy=RetryPolicy(base_delay=0.01),
+            upload_concurrency=limiter,
+        )
+        async with AsyncYaUploader(api=api) as disk_api:
+            await disk_api.create_folder("test_folder")
+            await disk_api.upload_photos("test_folder", (f"https://dog.ceo/x/pug/{i}.jpg" for i in range(8)))
+            assert len(disk_stub._children("/test_folder")) == 8
+            assert api.stats.retries == {RetryReason.OPERATION_FAILED: 4}
+
+    asyncio.run(upload())
+    assert limiter.limit < 8
+    assert limiter.in_flight == 0
+
+
+def test_cancelled_uploads_leave_limit_as_is(disk_stub):
+    disk_stub.operation_polls = 1000
+    # A success would add a whole slot.
+    limiter = AIMDLimiter(initial=4, increase=4.0, cooldown=0)
+    disk_api = YaUploader(token="test", base_url=disk_stub.api_url, upload_concurrency=limiter)
+    disk_api.create_folder("test_folder")
+    futures = [
+        disk_api.upload_photos_to_yd("test_folder", f"https://dog.ceo/x/pug/{i}.jpg", f"pug_{i}.jpg", wait=False)
+        for i in range(4)
+    ]
+    disk_api.close()
+    assert all(future.cancelled() for future in futures)
+    assert (limiter.limit, limiter.in_flight) == (4, 0)
+
+
+def test_request_concurrency_is_limited():
+    in_flight = max_in_flight = 0
+    lock = threading.Lock()
+
+    class CountingStub(DogCeoStub):
+        def handle(self, *args, **kwargs):
+            nonlocal in_flight, max_in_flight
+            with lock:
+                in_flight += 1
+                max_in_flight = max(max_in_flight, in_flight)
+            time.sleep(0.02)
+            with lock:
+                in_flight -= 1
+            return super().handle(*args, **kwargs)
+
+    with CountingStub() as stub:
+        dog_api = DogCeoApi(base_url=stub.api_url, concurrency=AIMDLimiter(initial=2, max_limit=3))
+        with ThreadPoolExecutor(8) as pool:
+            list(pool.map(lambda _: dog_api.get_url("spaniel"), range(24)))
+        dog_api.close()
+    assert max_in_flight <= 3
+
+
+def test_verify_folder(disk_stub, yandex_disk_api):
+    yandex_disk_api.create_folder("test_folder")
+    yandex_disk_api.create_folder("test_folder/pug_3.jpg")
+    yandex_disk_api.upload_many("test_folder", ((f"https://dog.ceo/x/pug/{i}.jpg", f"pug_{i}.jpg") for i in range(3)))
+    requests_before = disk_stub.requests
+    verification = yandex_disk_api.verify_folder("test_folder", ["pug_0.jpg", "pug_1.jpg", "pug_3.jpg", "pug_4.jpg"])
+    assert disk_stub.requests - requests_before == 1
+    assert verification.missing == {"pug_3.jpg", "pug_4.jpg"}
+    assert verification.unexpected == {"pug_2.jpg"}
+    assert not verification.ok
+    assert verification.items["pug_0.jpg"].md5 == disk_stub.resources["/test_folder/pug_0.jpg"]["md5"]
+
+
+def test_folder_watcher_relists_on_change(disk_stub, yandex_disk_api):
+    yandex_disk_api.create_folder("test_folder")
+    yandex_disk_api.upload_photos_to_yd("test_folder", "https://dog.ceo/x/pug/1.jpg", "pug_1.jpg")
+    watcher = FolderWatcher(yandex_disk_api, "test_folder")
+    assert watcher.verify(["pug_1.jpg"]).ok
+    requests_before = disk_stub.requests
+    for _ in range(3):
+        assert not watcher.refresh()
+        assert watcher.verify(["pug_1.jpg"]).ok
+    # Only the version is checked while nothing changes.
+    assert disk_stub.requests - requests_before == 6
+
+    yandex_disk_api.upload_photos_to_yd("test_folder", "https://dog.ceo/x/pug/2.jpg", "pug_2.jpg")
+    assert watcher.refresh()
+    assert watcher.verify(["pug_1.jpg", "pug_2.jpg"]).ok
+    revision = disk_stub.resources["/test_folder"]["revision"]
+    yandex_disk_api.upload_photos_to_yd("test_folder", "https://dog.ceo/x/pug/3.jpg", "pug_1.jpg")
+    # Overwritten in place: same number of items and revision of the folder, a new latest item.
+    assert watcher.refresh()
+    assert disk_stub.resources["/test_folder"]["revision"] == revision
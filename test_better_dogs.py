@@ -3,13 +3,12 @@ from __future__ import annotations
 import contextlib
 import os
 from lib2to3.fixes.fix_input import context
-from time import sleep
 
 import pytest
-import requests
 from pytest_assume.plugin import assume
 
-from framework.apis.dog_ceo import DogCeoApi
+from framework.apis.dog_ceo import DogCeoApi, file_name_from_url
+from framework.apis.policy import RetryPolicy
 from framework.apis.yandex_disk import YaUploader, ResourceType
 
 # Data folder & its path at Ya disk
@@ -34,7 +33,8 @@ def token():
 @pytest.fixture
 def yandex_disk_api(token):
     """Provide Yandex Disk API handler."""
-    with YaUploader(token=token) as disk_api:
+    # NOTE: серверная загрузка с Dog API восстанавливается секундами, а не миллисекундами.
+    with YaUploader(token=token, retry_policy=RetryPolicy(base_delay=5.0)) as disk_api:
         yield disk_api
 
 
@@ -52,20 +52,8 @@ def upload_photos(breed, yandex_disk_api, dog_api):
     sub_breeds = dog_api.get_sub_breeds(breed)
     urls = dog_api.get_urls(breed, sub_breeds)
     yandex_disk_api.create_folder(_DATA_FOLDER_NAME)
-    for task_num, url in enumerate(urls):
-        url_as_split = url.split('/')
-        extension, specific_breed = url_as_split[-1], url_as_split[-2]
-        name = '_'.join((specific_breed, extension))
-        max_attempts = 4
-        for attempt in range(0, max_attempts + 1):
-            try:
-                print(f"[Attempt [{attempt + 1}] Executing task # {task_num} {name}")
-                yandex_disk_api.upload_photos_to_yd(_DATA_FOLDER_NAME, url, name)
-                break
-            except requests.HTTPError:
-                if attempt == max_attempts:
-                    raise
-                sleep((attempt + 1) * 10)
+    # NOTE: ретраи (429, 5xx, failed статус операции) теперь делает retry_policy самого YaUploader.
+    yandex_disk_api.upload_many(_DATA_FOLDER_NAME, ((url, file_name_from_url(url)) for url in urls))
 
 
 @pytest.mark.parametrize(
@@ -79,7 +67,7 @@ def upload_photos(breed, yandex_disk_api, dog_api):
     ]
 )
 def test_upload_dog_photo(breed, upload_photos, yandex_disk_api, dog_api):
-    # Если бы не кэширование через декоратор,
+    # Если бы не кэширование в DogCeoApi,
     # то надо было вынести вычисление под-пород в фикстуру
     sub_breeds = dog_api.get_sub_breeds(breed)
 
@@ -0,0 +1,117 @@
+"""Offline tests of `framework.dedup`."""
+from __future__ import annotations
+
+import pytest
+
+from framework.apis.operations import PollBackoff
+from framework.apis.policy import RetryReason
+from framework.apis.session import SessionConfig
+from framework.apis.yandex_disk import YaUploader
+from framework.dedup import DedupIndex, DedupUploader
+from framework.stubs import DogCeoStub
+
+
+class _SameImageStub(DogCeoStub):
+    """Serves the same content under every image url."""
+
+    def image(self, path: str) -> bytes:
+        return super().image("/breeds/pug/1.jpg")
+
+
+@pytest.fixture
+def dog_stub():
+    """Provide a Dog CEO stub serving the same content under every image url."""
+    with _SameImageStub() as stub:
+        yield stub
+
+
+@pytest.fixture
+def yandex_disk_api(disk_stub):
+    """Provide Yandex Disk API handler bound to the stub, with a `test_folder`."""
+    with YaUploader("test", base_url=disk_stub.api_url, poll_backoff=PollBackoff(initial=0.01)) as disk_api:
+        disk_api.create_folder("test_folder")
+        yield disk_api
+
+
+def test_dedup_by_url(dog_stub, disk_stub, yandex_disk_api, tmp_path):
+    index_path = str(tmp_path / "dedup.json")
+    pug, akita = f"{dog_stub.url}/breeds/pug/1.jpg", f"{dog_stub.url}/breeds/akita/1.jpg"
+    report = DedupUploader(yandex_disk_api, DedupIndex(index_path)).upload_many(
+        "test_folder",
+        [(pug, "pug_1.jpg"), (akita, "akita_1.jpg"), (pug, "pug_again.jpg")],
+    )
+    assert report.uploaded == ["/test_folder/pug_1.jpg", "/test_folder/akita_1.jpg"]
+    assert report.copied == ["/test_folder/pug_again.jpg"]
+    assert len(disk_stub.operations) == 2
+
+    # The next run knows the urls from the persisted index.
+    report = DedupUploader(yandex_disk_api, DedupIndex(index_path)).upload_many(
+        "test_folder",
+        [(pug, "pug_again.jpg"), (akita, "akita_copy.jpg")],
+    )
+    assert report.skipped == ["/test_folder/pug_again.jpg"]
+    assert report.copied == ["/test_folder/akita_copy.jpg"]
+    assert len(disk_stub.operations) == 2
+    assert disk_stub.resources["/test_folder/akita_copy.jpg"]["md5"] == disk_stub.resources["/test_folder/akita_1.jpg"]["md5"]
+
+
+def test_dedup_by_content(dog_stub, disk_stub, yandex_disk_api):
+    uploader = DedupUploader(yandex_disk_api, hash_content=True)
+    report = uploader.upload_many(
+        "test_folder",
+        [(f"{dog_stub.url}/breeds/pug/1.jpg", "pug_1.jpg"), (f"{dog_stub.url}/breeds/pug/2.jpg", "pug_2.jpg")],
+    )
+    assert report.uploaded == ["/test_folder/pug_1.jpg"]
+    assert report.copied == ["/test_folder/pug_2.jpg"]
+    # Uploaded as downloaded, the disk fetched nothing.
+    assert not disk_stub.operations
+    assert disk_stub.resources["/test_folder/pug_2.jpg"]["size"] == dog_stub.image_size
+
+
+def test_dedup_by_content_in_chunks(dog_stub, disk_stub):
+    files = [(f"{dog_stub.url}/breeds/pug/{i}.jpg", f"pug_{i}.jpg") for i in range(5)]
+    with YaUploader("test", SessionConfig(pool_maxsize=2), base_url=disk_stub.api_url) as disk_api:
+        disk_api.create_folder("test_folder")
+        report = DedupUploader(disk_api, hash_content=True).upload_many("test_folder", files)
+        # Repeated content is recognized across chunks of 2.
+        assert report.uploaded == ["/test_folder/pug_0.jpg"]
+        assert len(report.copied) == 4
+        assert len(disk_stub._children("/test_folder")) == 5
+
+
+def test_deleted_source_is_uploaded_again(dog_stub, disk_stub, yandex_disk_api):
+    pug = f"{dog_stub.url}/breeds/pug/1.jpg"
+    uploader = DedupUploader(yandex_disk_api)
+    uploader.upload_many("test_folder", [(pug, "pug_1.jpg")])
+    del disk_stub.resources["/test_folder/pug_1.jpg"]
+    report = uploader.upload_many("test_folder", [(pug, "pug_2.jpg")])
+    assert report.uploaded == ["/test_folder/pug_2.jpg"] and not report.copied
+    assert uploader.index.by_url == {pug: "/test_folder/pug_2.jpg"}
+
+
+def test_deleted_target_is_uploaded_again(dog_stub, disk_stub, yandex_disk_api, tmp_path):
+    index_path = str(tmp_path / "dedup.json")
+    pug = f"{dog_stub.url}/breeds/pug/1.jpg"
+    DedupUploader(yandex_disk_api, DedupIndex(index_path)).upload_many("test_folder", [(pug, "pug_1.jpg")])
+    del disk_stub.resources["/test_folder/pug_1.jpg"]
+    report = DedupUploader(yandex_disk_api, DedupIndex(index_path)).upload_many("test_folder", [(pug, "pug_1.jpg")])
+    assert report.uploaded == ["/test_folder/pug_1.jpg"] and not report.skipped
+    assert "/test_folder/pug_1.jpg" in disk_stub.resources
+    report = DedupUploader(yandex_disk_api, DedupIndex(index_path)).upload_many("test_folder", [(pug, "pug_1.jpg")])
+    assert report.skipped == ["/test_folder/pug_1.jpg"]
+
+
+def test_repeated_target_is_planned_once(dog_stub, disk_stub, yandex_disk_api):
+    pug = f"{dog_stub.url}/breeds/pug/1.jpg"
+    report = DedupUploader(yandex_disk_api).upload_many("test_folder", [(pug, "pug_1.jpg"), (pug, "pug_1.jpg")])
+    assert report.uploaded == ["/test_folder/pug_1.jpg"] and not report.copied
+
+
+def test_download_is_retried(dog_stub, disk_stub, yandex_disk_api):
+    dog_stub.inject(503)
+    report = DedupUploader(yandex_disk_api, hash_content=True).upload_many(
+        "test_folder",
+        [(f"{dog_stub.url}/breeds/pug/1.jpg", "pug_1.jpg")],
+    )
+    assert report.uploaded == ["/test_folder/pug_1.jpg"]
+    assert yandex_disk_api.stats.retries == {RetryReason.SERVER_ERROR: 1}
@@ -0,0 +1,79 @@
+"""Offline tests of `framework.journal`."""
+from __future__ import annotations
+
+import pytest
+
+from framework.apis.dog_ceo import DogCeoApi
+from framework.apis.operations import PollBackoff
+from framework.apis.yandex_disk import YaUploader
+from framework.journal import Journal, JournalStage, run_journaled
+from framework.stubs import DogCeoStub, YandexDiskStub
+
+_BREEDS = ["doberman", "spaniel"]
+
+
+def _run(dog_stub: DogCeoStub, disk_stub: YandexDiskStub, journal_path: str, timeout: float = None):
+    dog_api = DogCeoApi(base_url=dog_stub.api_url)
+    backoff = PollBackoff(initial=0.01, max_delay=0.02)
+    try:
+        with YaUploader("test", base_url=disk_stub.api_url, poll_backoff=backoff) as disk_api, \
+                Journal(journal_path) as journal:
+            return run_journaled(dog_api, disk_api, _BREEDS, "test_folder", journal, timeout)
+    finally:
+        dog_api.close()
+
+
+def test_resume_after_timeout(dog_stub, disk_stub, tmp_path):
+    journal_path = str(tmp_path / "journal.jsonl")
+    disk_stub.operation_polls = 1000
+    with pytest.raises(TimeoutError):
+        _run(dog_stub, disk_stub, journal_path, timeout=0.1)
+    dog_requests, operations = dog_stub.requests, len(disk_stub.operations)
+    # The disk finishes the uploads meanwhile.
+    disk_stub.operations = dict.fromkeys(disk_stub.operations, 0)
+
+    report = _run(dog_stub, disk_stub, journal_path)
+    assert sorted(report.reattached) == sorted(report.completed)
+    assert len(report.completed) == 3
+    # Nothing resolved or uploaded again.
+    assert dog_stub.requests == dog_requests
+    assert len(disk_stub.operations) == operations
+
+    report = _run(dog_stub, disk_stub, journal_path)
+    assert len(report.skipped) == 3 and not report.completed
+    # Completed files outlive the clean up of the handler.
+    assert len(disk_stub._children("/test_folder")) == 3
+
+
+def test_forgotten_operation_is_uploaded_again(dog_stub, disk_stub, tmp_path):
+    journal_path = str(tmp_path / "journal.jsonl")
+    disk_stub.operation_polls = 1000
+    with pytest.raises(TimeoutError):
+        _run(dog_stub, disk_stub, journal_path, timeout=0.1)
+    disk_stub.operation_polls = 0
+    disk_stub.operations.clear()
+
+    report = _run(dog_stub, disk_stub, journal_path)
+    assert len(report.completed) == 3 and not report.failed
+    assert len(disk_stub.operations) == 3
+
+
+def test_journal_replay_and_compact(tmp_path):
+    journal_path = str(tmp_path / "journal.jsonl")
+    with Journal(journal_path) as journal:
+        journal.record_resolved("pug", ["https://dog.ceo/x/pug/1.jpg"])
+        journal.record_submitted("pug_1.jpg", "https://dog.ceo/x/pug/1.jpg", "/operations/1")
+        journal.record_failed("pug_1.jpg", "https://dog.ceo/x/pug/1.jpg", TimeoutError("slow"))
+    with open(journal_path, "a", encoding="utf-8") as f:
+        f.write('{"stage": "compl')
+    with Journal(journal_path) as journal:
+        assert journal.resolved == {"pug": ["https://dog.ceo/x/pug/1.jpg"]}
+        assert journal.files["pug_1.jpg"].stage is JournalStage.FAILED
+        journal.record_resolved("akita", [])
+    with Journal(journal_path) as journal:
+        assert journal.resolved["akita"] == []
+        journal.compact()
+    with open(journal_path, encoding="utf-8") as f:
+        assert len(f.readlines()) == 3
+    with Journal(journal_path) as journal:
+        assert journal.files["pug_1.jpg"].error == "TimeoutError: slow"
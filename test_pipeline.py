@@ -0,0 +1,55 @@
+"""Offline tests of `framework.pipeline`."""
+from __future__ import annotations
+
+import threading
+
+import pytest
+
+from framework.apis.dog_ceo import DogCeoApi
+from framework.apis.operations import PollBackoff
+from framework.apis.yandex_disk import YaUploader
+from framework.pipeline import Pipeline, Stage, run_transfer
+from framework.stubs import DogCeoStub
+
+
+@pytest.fixture
+def dog_api():
+    """Provide Dog Ceo API handler bound to a stub."""
+    with DogCeoStub({f"breed{i}": [f"sub{j}" for j in range(i % 3)] for i in range(20)}) as stub:
+        api = DogCeoApi(base_url=stub.api_url)
+        yield api
+        api.close()
+
+
+def test_run_transfer(dog_api, disk_stub):
+    disk_stub.operation_polls = 1
+    with YaUploader("test", base_url=disk_stub.api_url, poll_backoff=PollBackoff(initial=0.01)) as disk_api:
+        report = run_transfer(dog_api, disk_api, (f"breed{i}" for i in range(20)), "test_folder", queue_size=2)
+        assert not report.failures
+        resolve, name, upload = report.stages
+        assert resolve.processed == 20
+        # 7 breeds with no sub breeds, 7 with one and 6 with two.
+        assert upload.processed == name.processed == 7 + 7 + 12
+        assert len(disk_stub._children("/test_folder")) == 26
+        assert all(stats.max_queue_depth <= 2 for stats in report.stages)
+
+
+def test_stages_overlap_and_failures_are_kept():
+    first_item_uploaded = threading.Event()
+
+    def produce(item: int) -> list[int]:
+        if item == 3:
+            raise ValueError(item)
+        # Later items wait for the last stage to start, which would deadlock a batch pipeline.
+        if item > 0:
+            assert first_item_uploaded.wait(timeout=5)
+        return [item]
+
+    def consume(item: int) -> list[int]:
+        first_item_uploaded.set()
+        return [item]
+
+    report = Pipeline(Stage("produce", produce, queue_size=1), Stage("consume", consume, 2, queue_size=1)).run(range(10))
+    assert [failure.item for failure in report.failures] == [3]
+    assert report.stages[1].processed == 9
+    assert report.stages[0].throughput > 0
@@ -0,0 +1,53 @@
+"""Offline tests of `framework.runner`."""
+from __future__ import annotations
+
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from framework.runner import ShardFailure, ShardResult, ShardTask, collect_shard, run_sharded, shard_breeds
+from framework.stubs import DogCeoStub, resource_payload
+
+
+@pytest.fixture
+def dog_stub():
+    """Provide a Dog CEO stub with 12 breeds, every third without sub breeds."""
+    with DogCeoStub({f"breed{i}": [f"sub{j}" for j in range(i % 3)] for i in range(12)}) as stub:
+        yield stub
+
+
+def test_shard_breeds():
+    assert shard_breeds(["a", "b", "c", "d", "e"], 2) == [("a", "c", "e"), ("b", "d")]
+    assert shard_breeds(["a"], 4) == [("a",)]
+
+
+def test_run_sharded(dog_stub, disk_stub):
+    # Left from a previous run.
+    disk_stub.resources["/test_folder"] = resource_payload("/test_folder", "dir")
+    report = run_sharded(
+        "test",
+        "test_folder",
+        [*dog_stub.breeds, "unknown"],
+        processes=3,
+        dog_base_url=dog_stub.api_url,
+        disk_base_url=disk_stub.api_url,
+    )
+    assert [shard.breeds for shard in report.shards] == [5, 4, 4]
+    # 4 breeds with no sub breeds, 4 with one and 4 with two.
+    assert len(report.uploaded) == len(set(report.uploaded)) == 4 + 4 + 8
+    assert len(disk_stub._children("/test_folder")) == 16
+    assert [(failure.stage, failure.item) for failure in report.failures] == [("resolve", "'unknown'")]
+    assert "HTTPError" in report.failures[0].error
+
+
+def test_collect_shard():
+    task = ShardTask(1, ("a", "b"), "test_folder", "test")
+    done = Future()
+    done.set_result(ShardResult(1, 2, uploaded=["a.jpg", "b.jpg"]))
+    assert collect_shard(task, done).uploaded == ["a.jpg", "b.jpg"]
+    broken = Future()
+    broken.set_exception(BrokenProcessPool("worker died"))
+    assert collect_shard(task, broken) == ShardResult(
+        1, 2, failures=[ShardFailure("shard", "('a', 'b')", "BrokenProcessPool: worker died")]
+    )
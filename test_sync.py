@@ -0,0 +1,42 @@
+"""Offline tests of `framework.sync`."""
+from __future__ import annotations
+
+from framework.apis.yandex_disk import YaUploader
+from framework.sync import SyncManifest, sync_photos
+
+
+def _files(count: int) -> list[tuple[str, str]]:
+    return [(f"https://dog.ceo/breeds/pug/{i}.jpg", f"pug_{i}.jpg") for i in range(count)]
+
+
+def test_resync_costs_one_listing(disk_stub, yandex_disk_api, tmp_path):
+    manifest_path = str(tmp_path / "manifest.json")
+    plan = sync_photos(yandex_disk_api, "/sync", _files(10), manifest_path)
+    assert len(plan.upload) == 10
+    assert SyncManifest(manifest_path).entries["pug_3.jpg"].md5 == disk_stub.resources["/sync/pug_3.jpg"]["md5"]
+
+    requests_before = disk_stub.requests
+    plan = sync_photos(yandex_disk_api, "/sync", _files(10), manifest_path)
+    assert (plan.upload, len(plan.skipped)) == ([], 10)
+    assert disk_stub.requests - requests_before == 1
+
+
+def test_only_missing_and_changed_files_are_uploaded(disk_stub, yandex_disk_api, tmp_path):
+    manifest_path = str(tmp_path / "manifest.json")
+    sync_photos(yandex_disk_api, "/sync", _files(5), manifest_path)
+    del disk_stub.resources["/sync/pug_0.jpg"]
+    disk_stub.resources["/sync/pug_1.jpg"]["md5"] = "changed"
+    files = _files(6)
+    files[2] = ("https://dog.ceo/breeds/pug/other.jpg", "pug_2.jpg")
+    plan = sync_photos(yandex_disk_api, "/sync", files, manifest_path)
+    assert sorted(name for _, name in plan.upload) == ["pug_0.jpg", "pug_1.jpg", "pug_2.jpg", "pug_5.jpg"]
+    assert sorted(plan.skipped) == ["pug_3.jpg", "pug_4.jpg"]
+
+
+def test_synced_folder_survives_clean_up(disk_stub, tmp_path):
+    manifest_path = str(tmp_path / "manifest.json")
+    for uploaded, skipped in [(5, 0), (0, 5)]:
+        with YaUploader(token="test", base_url=disk_stub.api_url) as disk_api:
+            plan = sync_photos(disk_api, "/photos/sync", _files(5), manifest_path)
+        assert (len(plan.upload), len(plan.skipped)) == (uploaded, skipped)
+    assert len(disk_stub._children("/photos/sync")) == 5